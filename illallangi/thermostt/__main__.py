@@ -1,18 +1,24 @@
+from datetime import datetime
 from os.path import basename
-from sys import argv, stderr
+from sys import argv
 
-from click import Choice as CHOICE, FLOAT, INT, STRING, group, option
+from click import Choice as CHOICE, FLOAT, INT, IntRange, Path as PATH, STRING, UsageError, echo, get_current_context, group, option
 
 from loguru import logger
 
-from notifiers.logging import NotificationHandler
-
-from .controller import Controller
-from .health import Health
-from .load import Load
-from .sensor import Sensor
-from .vmax import VMax
-from .vmin import VMin
+from . import codec, metrics
+from .benchmark import benchmark_filters, benchmark_pipeline, load_history, regressions, save_history
+from .config import controller, load_config
+from .history import HistoryPolicy
+from .loadtest import loadtest
+from .loop import start
+from .notifier import configure
+from .recorder import Recorder
+from .replay import replay
+from .session import SessionPolicy
+from .snapshot import SnapshotStore
+from .state import formats
+from .supervisor import Supervisor, serve
 
 
 @group()
@@ -20,6 +26,14 @@ from .vmin import VMin
         type=CHOICE(['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'SUCCESS', 'TRACE'],
                     case_sensitive=False),
         default='INFO')
+@option('--log-enqueue',
+        is_flag=True,
+        envvar='LOG_ENQUEUE',
+        default=False)
+@option('--log-repeat-interval',
+        type=FLOAT,
+        envvar='LOG_REPEAT_INTERVAL',
+        default=60.0)
 @option('--slack-webhook',
         type=STRING,
         envvar='SLACK_WEBHOOK',
@@ -32,24 +46,39 @@ from .vmin import VMin
         type=STRING,
         envvar='SLACK_FORMAT',
         default='{message}')
-def cli(log_level, slack_webhook, slack_username, slack_format):
-    logger.remove()
-    logger.add(stderr, level=log_level)
+@option('--slack-queue-size',
+        type=INT,
+        envvar='SLACK_QUEUE_SIZE',
+        default=100)
+@option('--slack-batch-interval',
+        type=FLOAT,
+        envvar='SLACK_BATCH_INTERVAL',
+        default=2.0)
+@option('--json-backend',
+        type=CHOICE(['auto', *codec.backends],
+                    case_sensitive=False),
+        envvar='JSON_BACKEND',
+        default='auto')
+def cli(log_level, log_enqueue, log_repeat_interval, slack_webhook, slack_username, slack_format, slack_queue_size, slack_batch_interval, json_backend):
+    configure(log_level, slack_webhook, slack_username, slack_format, slack_queue_size, slack_batch_interval, log_enqueue, log_repeat_interval)
 
-    if slack_webhook:
-        params = {
-            "username": slack_username,
-            "webhook_url": slack_webhook
-        }
-        slack = NotificationHandler("slack", defaults=params)
-        logger.add(slack, format=slack_format, level="SUCCESS")
+    try:
+        codec.use(json_backend.lower())
+    except ValueError as e:
+        raise UsageError(str(e))
 
     logger.success(f'{basename(argv[0])} Started')
     logger.info('  --log-level "{}"', log_level)
+    if log_enqueue:
+        logger.info('  --log-enqueue')
+    logger.info('  --log-repeat-interval "{}"', log_repeat_interval)
     if slack_webhook:
         logger.info('  --slack-webhook "{}"', slack_webhook)
         logger.info('  --slack-username "{}"', slack_username)
         logger.info('  --slack-format "{}"', slack_format)
+        logger.info('  --slack-queue-size "{}"', slack_queue_size)
+        logger.info('  --slack-batch-interval "{}"', slack_batch_interval)
+    logger.info('  --json-backend "{}" ({})', json_backend, codec.backend)
 
 
 @cli.command(name='run', context_settings={"auto_envvar_prefix": "THERMOSTT"})
@@ -68,47 +97,93 @@ def cli(log_level, slack_webhook, slack_username, slack_format):
 @option('--qe-value', type=STRING, required=False)
 @option('--load-topic', type=STRING, required=False)
 @option('--load-jmespath', type=STRING, required=False)
+@option('--load-max-age', type=FLOAT, required=False)
+@option('--load-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--load-health', type=STRING, required=False)
 @option('--load-health-topic', type=STRING, required=False)
 @option('--load-health-jmespath', type=STRING, required=False)
 @option('--load-health-healthy', type=STRING, required=False)
+@option('--load-health-max-age', type=FLOAT, required=False)
+@option('--load-health-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--sensor', type=STRING, required=True)
 @option('--sensor-delta', type=FLOAT, required=False, default=0.0)
+@option('--sensor-smoothing', type=STRING, required=False)
+@option('--sensor-max-age', type=FLOAT, required=False)
+@option('--sensor-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--sensor-topic', type=STRING, required=False)
 @option('--sensor-jmespath', type=STRING, required=False)
 @option('--sensor-health', type=STRING, required=True)
 @option('--sensor-health-topic', type=STRING, required=False)
 @option('--sensor-health-jmespath', type=STRING, required=False)
 @option('--sensor-health-healthy', type=STRING, required=False)
+@option('--sensor-health-max-age', type=FLOAT, required=False)
+@option('--sensor-health-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--vmax', type=STRING, required=False)
 @option('--vmax-delta', type=FLOAT, required=False, default=0.0)
 @option('--vmax-topic', type=STRING, required=False)
 @option('--vmax-jmespath', type=STRING, required=False)
+@option('--vmax-max-age', type=FLOAT, required=False)
+@option('--vmax-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--vmin', type=STRING, required=False)
 @option('--vmin-delta', type=FLOAT, required=False, default=0.0)
 @option('--vmin-topic', type=STRING, required=False)
 @option('--vmin-jmespath', type=STRING, required=False)
+@option('--vmin-max-age', type=FLOAT, required=False)
+@option('--vmin-qos', type=IntRange(0, 2), required=False, default=0)
 @option('--state-topic', type=STRING, required=False)
 @option('--lwt-topic', type=STRING, required=False)
+@option('--state-heartbeat', type=FLOAT, required=False, default=60.0)
+@option('--state-interval', type=FLOAT, required=False, default=0.0)
+@option('--state-retain', is_flag=True, default=False)
+@option('--state-format', type=CHOICE(list(formats)), required=False, default='json')
+@option('--runtime', type=CHOICE(['paho', 'asyncio']), required=False, default='paho')
+@option('--record', type=PATH(dir_okay=False), required=False)
+@option('--record-size', type=INT, required=False, default=16)
+@option('--metrics-port', type=INT, required=False)
+@option('--metrics-host', type=STRING, required=False, default='0.0.0.0')
+@option('--command-retry', type=FLOAT, required=False, default=10.0)
+@option('--command-retry-cap', type=FLOAT, required=False, default=300.0)
+@option('--snapshot', type=PATH(dir_okay=False), required=False)
+@option('--snapshot-interval', type=FLOAT, required=False, default=30.0)
+@option('--snapshot-max-age', type=FLOAT, required=False, default=300.0)
+@option('--conflate', type=INT, required=False, default=0)
+@option('--client-id', type=STRING, required=False)
+@option('--persistent-session', is_flag=True, default=False)
+@option('--reconnect', type=FLOAT, required=False, default=1.0)
+@option('--reconnect-cap', type=FLOAT, required=False, default=60.0)
+@option('--subscribe-batch', type=INT, required=False, default=100)
+@option('--history', is_flag=True, default=False)
+@option('--history-raw', type=INT, required=False, default=720)
+@option('--history-1m', type=INT, required=False, default=1440)
+@option('--history-15m', type=INT, required=False, default=672)
 def run(
         server,
         port,
         sensor,
         sensor_delta,
+        sensor_smoothing,
+        sensor_max_age,
+        sensor_qos,
         sensor_topic,
         sensor_jmespath,
         sensor_health,
         sensor_health_topic,
         sensor_health_jmespath,
         sensor_health_healthy,
+        sensor_health_max_age,
+        sensor_health_qos,
         vmax,
         vmax_delta,
         vmax_topic,
         vmax_jmespath,
+        vmax_max_age,
+        vmax_qos,
         vmin,
         vmin_delta,
         vmin_topic,
         vmin_jmespath,
+        vmin_max_age,
+        vmin_qos,
         load,
         q0,
         q0_topic,
@@ -121,13 +196,41 @@ def run(
         qe_value,
         load_topic,
         load_jmespath,
+        load_max_age,
+        load_qos,
         load_health,
         load_health_topic,
         load_health_jmespath,
         load_health_healthy,
+        load_health_max_age,
+        load_health_qos,
         name,
         state_topic,
-        lwt_topic):
+        lwt_topic,
+        state_heartbeat,
+        state_interval,
+        state_retain,
+        state_format,
+        runtime,
+        record,
+        record_size,
+        metrics_port,
+        metrics_host,
+        command_retry,
+        command_retry_cap,
+        snapshot,
+        snapshot_interval,
+        snapshot_max_age,
+        conflate,
+        client_id,
+        persistent_session,
+        reconnect,
+        reconnect_cap,
+        subscribe_batch,
+        history,
+        history_raw,
+        history_1m,
+        history_15m):
 
     logger.info('  run')
     if server:
@@ -138,6 +241,12 @@ def run(
         logger.info('    --sensor "{}"', sensor)
     if sensor_delta:
         logger.info('    --sensor-delta "{}"', sensor_delta)
+    if sensor_smoothing:
+        logger.info('    --sensor-smoothing "{}"', sensor_smoothing)
+    if sensor_max_age:
+        logger.info('    --sensor-max-age "{}"', sensor_max_age)
+    if sensor_qos:
+        logger.info('    --sensor-qos "{}"', sensor_qos)
     if sensor_topic:
         logger.info('    --sensor-topic "{}"', sensor_topic)
     if sensor_jmespath:
@@ -150,6 +259,10 @@ def run(
         logger.info('    --sensor-health-jmespath "{}"', sensor_health_jmespath)
     if sensor_health_healthy:
         logger.info('    --sensor-health-healthy "{}"', sensor_health_healthy)
+    if sensor_health_max_age:
+        logger.info('    --sensor-health-max-age "{}"', sensor_health_max_age)
+    if sensor_health_qos:
+        logger.info('    --sensor-health-qos "{}"', sensor_health_qos)
     if vmax:
         logger.info('    --vmax "{}"', vmax)
     if vmax_delta:
@@ -158,6 +271,10 @@ def run(
         logger.info('    --vmax-topic "{}"', vmax_topic)
     if vmax_jmespath:
         logger.info('    --vmax-jmespath "{}"', vmax_jmespath)
+    if vmax_max_age:
+        logger.info('    --vmax-max-age "{}"', vmax_max_age)
+    if vmax_qos:
+        logger.info('    --vmax-qos "{}"', vmax_qos)
     if vmin:
         logger.info('    --vmin "{}"', vmin)
     if vmin_delta:
@@ -166,6 +283,10 @@ def run(
         logger.info('    --vmin-topic "{}"', vmin_topic)
     if vmin_jmespath:
         logger.info('    --vmin-jmespath "{}"', vmin_jmespath)
+    if vmin_max_age:
+        logger.info('    --vmin-max-age "{}"', vmin_max_age)
+    if vmin_qos:
+        logger.info('    --vmin-qos "{}"', vmin_qos)
     if load:
         logger.info('    --load "{}"', load)
     if q0:
@@ -190,6 +311,10 @@ def run(
         logger.info('    --load-topic "{}"', load_topic)
     if load_jmespath:
         logger.info('    --load-jmespath "{}"', load_jmespath)
+    if load_max_age:
+        logger.info('    --load-max-age "{}"', load_max_age)
+    if load_qos:
+        logger.info('    --load-qos "{}"', load_qos)
     if load_health:
         logger.info('    --load-health "{}"', load_health)
     if load_health_topic:
@@ -198,59 +323,399 @@ def run(
         logger.info('    --load-health-jmespath "{}"', load_health_jmespath)
     if load_health_healthy:
         logger.info('    --load-health-healthy "{}"', load_health_healthy)
+    if load_health_max_age:
+        logger.info('    --load-health-max-age "{}"', load_health_max_age)
+    if load_health_qos:
+        logger.info('    --load-health-qos "{}"', load_health_qos)
     if name:
         logger.info('    --name "{}"', name)
     if state_topic:
         logger.info('    --state-topic "{}"', state_topic)
     if lwt_topic:
         logger.info('    --lwt-topic "{}"', lwt_topic)
+    if state_heartbeat:
+        logger.info('    --state-heartbeat "{}"', state_heartbeat)
+    if state_interval:
+        logger.info('    --state-interval "{}"', state_interval)
+    if state_retain:
+        logger.info('    --state-retain')
+    if state_format:
+        logger.info('    --state-format "{}"', state_format)
+    if runtime:
+        logger.info('    --runtime "{}"', runtime)
+    if record:
+        logger.info('    --record "{}"', record)
+        logger.info('    --record-size "{}"', record_size)
+    if metrics_port:
+        logger.info('    --metrics-port "{}"', metrics_port)
+        logger.info('    --metrics-host "{}"', metrics_host)
+    if command_retry:
+        logger.info('    --command-retry "{}"', command_retry)
+    if command_retry_cap:
+        logger.info('    --command-retry-cap "{}"', command_retry_cap)
+    if snapshot:
+        logger.info('    --snapshot "{}"', snapshot)
+        logger.info('    --snapshot-interval "{}"', snapshot_interval)
+        logger.info('    --snapshot-max-age "{}"', snapshot_max_age)
+    if conflate:
+        logger.info('    --conflate "{}"', conflate)
+    if client_id:
+        logger.info('    --client-id "{}"', client_id)
+    if persistent_session:
+        logger.info('    --persistent-session')
+    logger.info('    --reconnect "{}"', reconnect)
+    logger.info('    --reconnect-cap "{}"', reconnect_cap)
+    logger.info('    --subscribe-batch "{}"', subscribe_batch)
+    if history:
+        logger.info('    --history')
+        logger.info('    --history-raw "{}"', history_raw)
+        logger.info('    --history-1m "{}"', history_1m)
+        logger.info('    --history-15m "{}"', history_15m)
+
+    if persistent_session and not (client_id or name):
+        raise UsageError('--persistent-session needs --client-id or --name')
+
+    store = SnapshotStore(snapshot, interval=snapshot_interval, max_age=snapshot_max_age) if snapshot else None
 
-    Controller(
+    c = controller(
         server,
         port,
-        Load(
-            load,
-            q0=None if q0 is None else q0.split(','),
-            q0_topic=q0_topic,
-            q0_value=q0_value,
-            q1=None if q1 is None else q1.split(','),
-            q1_topic=q1_topic,
-            q1_value=q1_value,
-            qe=None if qe is None else qe.split(','),
-            qe_topic=qe_topic,
-            qe_value=qe_value,
-            topic=load_topic,
-            jmespath=load_jmespath),
-        Sensor(
-            sensor,
-            topic=sensor_topic,
-            jmespath=sensor_jmespath,
-            delta=sensor_delta),
-        VMax(
-            vmax or name,
-            topic=vmax_topic,
-            jmespath=vmax_jmespath,
-            delta=vmax_delta),
-        VMin(
-            vmin or name,
-            topic=vmin_topic,
-            jmespath=vmin_jmespath,
-            delta=vmin_delta),
-        [
-            Health(
-                sensor_health or sensor,
-                topic=sensor_health_topic,
-                jmespath=sensor_health_jmespath,
-                healthy=None if sensor_health_healthy is None else sensor_health_healthy.split(',')),
-            Health(
-                load_health or load,
-                topic=load_health_topic,
-                jmespath=load_health_jmespath,
-                healthy=None if load_health_healthy is None else load_health_healthy.split(',')),
-        ],
+        load=load,
+        q0=q0,
+        q0_topic=q0_topic,
+        q0_value=q0_value,
+        q1=q1,
+        q1_topic=q1_topic,
+        q1_value=q1_value,
+        qe=qe,
+        qe_topic=qe_topic,
+        qe_value=qe_value,
+        load_topic=load_topic,
+        load_jmespath=load_jmespath,
+        load_max_age=load_max_age,
+        load_qos=load_qos,
+        load_health=load_health,
+        load_health_topic=load_health_topic,
+        load_health_jmespath=load_health_jmespath,
+        load_health_healthy=load_health_healthy,
+        load_health_max_age=load_health_max_age,
+        load_health_qos=load_health_qos,
+        sensor=sensor,
+        sensor_delta=sensor_delta,
+        sensor_smoothing=sensor_smoothing,
+        sensor_max_age=sensor_max_age,
+        sensor_qos=sensor_qos,
+        sensor_topic=sensor_topic,
+        sensor_jmespath=sensor_jmespath,
+        sensor_health=sensor_health,
+        sensor_health_topic=sensor_health_topic,
+        sensor_health_jmespath=sensor_health_jmespath,
+        sensor_health_healthy=sensor_health_healthy,
+        sensor_health_max_age=sensor_health_max_age,
+        sensor_health_qos=sensor_health_qos,
+        vmax=vmax,
+        vmax_delta=vmax_delta,
+        vmax_topic=vmax_topic,
+        vmax_jmespath=vmax_jmespath,
+        vmax_max_age=vmax_max_age,
+        vmax_qos=vmax_qos,
+        vmin=vmin,
+        vmin_delta=vmin_delta,
+        vmin_topic=vmin_topic,
+        vmin_jmespath=vmin_jmespath,
+        vmin_max_age=vmin_max_age,
+        vmin_qos=vmin_qos,
         name=name,
         lwt_topic=lwt_topic,
-        state_topic=state_topic).connect().loop_forever()
+        state_topic=state_topic,
+        state_heartbeat=state_heartbeat,
+        state_interval=state_interval,
+        state_retain=state_retain,
+        state_format=state_format,
+        recorder=Recorder(record, size=record_size * 2 ** 20) if record else None,
+        store=store,
+        conflate=conflate,
+        session=SessionPolicy(
+            client_id=client_id,
+            clean_session=not persistent_session,
+            batch_size=subscribe_batch,
+            reconnect=reconnect,
+            reconnect_cap=reconnect_cap),
+        history=HistoryPolicy(
+            raw_capacity=history_raw,
+            minutes=history_1m,
+            quarters=history_15m) if history else None,
+        command_retry=command_retry,
+        command_retry_cap=command_retry_cap)
+    if store is not None:
+        store.restore([c])
+    if metrics_port:
+        metrics.enable([c], metrics_port, metrics_host, queue=c.queue)
+    start(c, runtime)
+
+
+@cli.command(name='run-many', context_settings={"auto_envvar_prefix": "THERMOSTT"})
+@option('--config', type=PATH(exists=True, dir_okay=False), required=True)
+@option('--server', type=STRING, required=False)
+@option('--port', type=INT, required=False)
+@option('--name', type=STRING, required=False)
+@option('--lwt-topic', type=STRING, required=False)
+@option('--runtime', type=CHOICE(['paho', 'asyncio']), required=False, default='paho')
+@option('--record', type=PATH(dir_okay=False), required=False)
+@option('--record-size', type=INT, required=False, default=16)
+@option('--metrics-port', type=INT, required=False)
+@option('--metrics-host', type=STRING, required=False, default='0.0.0.0')
+@option('--snapshot', type=PATH(dir_okay=False), required=False)
+@option('--snapshot-interval', type=FLOAT, required=False, default=30.0)
+@option('--snapshot-max-age', type=FLOAT, required=False, default=300.0)
+@option('--watch', is_flag=True, default=False)
+@option('--workers', type=INT, required=False, default=1)
+@option('--batch', is_flag=True, default=False)
+@option('--conflate', type=INT, required=False, default=0)
+@option('--client-id', type=STRING, required=False)
+@option('--persistent-session', is_flag=True, default=False)
+@option('--reconnect', type=FLOAT, required=False, default=1.0)
+@option('--reconnect-cap', type=FLOAT, required=False, default=60.0)
+@option('--subscribe-batch', type=INT, required=False, default=100)
+@option('--history', is_flag=True, default=False)
+@option('--history-raw', type=INT, required=False, default=720)
+@option('--history-1m', type=INT, required=False, default=1440)
+@option('--history-15m', type=INT, required=False, default=672)
+def run_many(
+        config,
+        server,
+        port,
+        name,
+        lwt_topic,
+        runtime,
+        record,
+        record_size,
+        metrics_port,
+        metrics_host,
+        snapshot,
+        snapshot_interval,
+        snapshot_max_age,
+        watch,
+        workers,
+        batch,
+        conflate,
+        client_id,
+        persistent_session,
+        reconnect,
+        reconnect_cap,
+        subscribe_batch,
+        history,
+        history_raw,
+        history_1m,
+        history_15m):
+
+    logger.info('  run-many')
+    if config:
+        logger.info('    --config "{}"', config)
+    if server:
+        logger.info('    --server "{}"', server)
+    if port:
+        logger.info('    --port "{}"', port)
+    if name:
+        logger.info('    --name "{}"', name)
+    if lwt_topic:
+        logger.info('    --lwt-topic "{}"', lwt_topic)
+    if runtime:
+        logger.info('    --runtime "{}"', runtime)
+    if record:
+        logger.info('    --record "{}"', record)
+        logger.info('    --record-size "{}"', record_size)
+    if metrics_port:
+        logger.info('    --metrics-port "{}"', metrics_port)
+        logger.info('    --metrics-host "{}"', metrics_host)
+    if snapshot:
+        logger.info('    --snapshot "{}"', snapshot)
+        logger.info('    --snapshot-interval "{}"', snapshot_interval)
+        logger.info('    --snapshot-max-age "{}"', snapshot_max_age)
+    if watch:
+        logger.info('    --watch')
+
+    if workers > 1:
+        logger.info('    --workers "{}"', workers)
+    if batch:
+        logger.info('    --batch')
+    if conflate:
+        logger.info('    --conflate "{}"', conflate)
+    if client_id:
+        logger.info('    --client-id "{}"', client_id)
+    if persistent_session:
+        logger.info('    --persistent-session')
+    logger.info('    --reconnect "{}"', reconnect)
+    logger.info('    --reconnect-cap "{}"', reconnect_cap)
+    logger.info('    --subscribe-batch "{}"', subscribe_batch)
+    if history:
+        logger.info('    --history')
+        logger.info('    --history-raw "{}"', history_raw)
+        logger.info('    --history-1m "{}"', history_1m)
+        logger.info('    --history-15m "{}"', history_15m)
+
+    kwargs = {
+        'runtime': runtime,
+        'record': record,
+        'record_size': record_size,
+        'metrics_port': metrics_port,
+        'metrics_host': metrics_host,
+        'snapshot': snapshot,
+        'snapshot_interval': snapshot_interval,
+        'snapshot_max_age': snapshot_max_age,
+        'watch': watch,
+        'batch': batch,
+        'conflate': conflate,
+        'client_id': client_id,
+        'persistent_session': persistent_session,
+        'reconnect': reconnect,
+        'reconnect_cap': reconnect_cap,
+        'subscribe_batch': subscribe_batch,
+        'history': history,
+        'history_raw': history_raw,
+        'history_1m': history_1m,
+        'history_15m': history_15m,
+    }
+    try:
+        c = load_config(config)
+        if not (server or c['server']):
+            raise ValueError('No server specified on the command line or in the config file')
+        if persistent_session and not (client_id or name or c['name']):
+            raise ValueError('--persistent-session needs --client-id, --name or a name in the config file')
+        if workers > 1:
+            root = get_current_context().find_root().params
+            Supervisor(
+                server or c['server'],
+                port or c['port'] or 1883,
+                workers,
+                config,
+                name=name or c['name'],
+                lwt_topic=lwt_topic or c['lwt_topic'],
+                logging={k: v for k, v in root.items() if k != 'json_backend'},
+                json_backend=root['json_backend'].lower(),
+                kwargs=kwargs).run()
+            return
+    except ValueError as e:
+        raise UsageError(str(e))
+    serve(config, server=server, port=port, name=name, lwt_topic=lwt_topic, **kwargs)
+
+
+@cli.command(name='replay')
+@option('--recording', type=PATH(exists=True, dir_okay=False), required=True)
+@option('--config', type=PATH(exists=True, dir_okay=False), required=True)
+@option('--speed', type=FLOAT, required=False, default=0.0)
+@option('--verbose', is_flag=True, default=False)
+def replay_recording(
+        recording,
+        config,
+        speed,
+        verbose):
+
+    logger.info('  replay')
+    if recording:
+        logger.info('    --recording "{}"', recording)
+    if config:
+        logger.info('    --config "{}"', config)
+    if speed:
+        logger.info('    --speed "{}"', speed)
+    if verbose:
+        logger.info('    --verbose')
+
+    try:
+        c = load_config(config)
+    except ValueError as e:
+        raise UsageError(str(e))
+    controllers = [
+        controller(c['server'], c['port'] or 1883, **z)
+        for z in c['zones']
+    ]
+
+    count = 0
+    mismatches = 0
+    for timestamp, sequence, topic, recorded, replayed in replay(recording, controllers, speed):
+        count += 1
+        line = f'{sequence:>8} {datetime.utcfromtimestamp(timestamp).isoformat()} {topic} {replayed or "-"}'
+        if recorded != replayed:
+            mismatches += 1
+            echo(f'!! {line} (recorded {recorded or "-"})')
+        elif verbose:
+            echo(f'   {line}')
+    echo(f'Replayed {count} messages, {mismatches} decisions differ from the recording')
+
+
+@cli.command(name='benchmark')
+@option('--iterations', type=INT, required=False, default=10000)
+@option('--history', type=PATH(dir_okay=False), required=False)
+@option('--tolerance', type=FLOAT, required=False, default=0.2)
+def benchmark(
+        iterations,
+        history,
+        tolerance):
+
+    logger.info('  benchmark')
+    if iterations:
+        logger.info('    --iterations "{}"', iterations)
+    if history:
+        logger.info('    --history "{}"', history)
+    if tolerance:
+        logger.info('    --tolerance "{}"', tolerance)
+
+    echo(f'{"filter":<56} {"accessor":<12} {"jmespath":>10} {"compiled":>10} {"speedup":>8}')
+    for expression, accessor, generic, compiled in benchmark_filters(iterations):
+        echo(f'{expression:<56} {accessor:<12} {generic * 1e9:>8.0f}ns {compiled * 1e9:>8.0f}ns {generic / compiled:>7.1f}x')
+
+    echo('')
+    echo(f'{"stage":<12} {"msgs/sec":>12} {"p50":>10} {"p99":>10}')
+    results = {}
+    for stage, result in benchmark_pipeline(iterations):
+        results[stage] = result
+        echo(f'{stage:<12} {result["ops"]:>12.0f} {result["p50"]:>8}ns {result["p99"]:>8}ns')
+
+    if not history:
+        return
+
+    previous = load_history(history)
+    save_history(history, results)
+    if not previous:
+        return
+
+    failed = False
+    for stage, before, after in regressions(previous[-1], results, tolerance):
+        logger.warning('Regression in {}: {:.0f} msgs/sec down from {:.0f}', stage, after, before)
+        failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command(name='loadtest')
+@option('--zones', type=INT, multiple=True, default=[10, 100, 1000, 10000])
+@option('--duration', type=FLOAT, required=False, default=600.0)
+@option('--step', type=FLOAT, required=False, default=1.0)
+@option('--teleperiod', type=FLOAT, required=False, default=10.0)
+@option('--shared/--standalone', default=True)
+def load_test(
+        zones,
+        duration,
+        step,
+        teleperiod,
+        shared):
+
+    logger.info('  loadtest')
+    if zones:
+        logger.info('    --zones "{}"', ','.join(str(z) for z in zones))
+    if duration:
+        logger.info('    --duration "{}"', duration)
+    if step:
+        logger.info('    --step "{}"', step)
+    if teleperiod:
+        logger.info('    --teleperiod "{}"', teleperiod)
+    logger.info('    --{}', 'shared' if shared else 'standalone')
+
+    echo(f'{"zones":>6} {"wall":>8} {"cpu":>8} {"msgs":>9} {"msgs/sec":>9} {"cmds":>7} {"switches":>8} {"p50":>9} {"p99":>9} {"rss":>8} {"kb/zone":>8}')
+    for r in loadtest(zones, duration=duration, step=step, teleperiod=teleperiod, shared=shared):
+        p50 = '-' if r['p50'] is None else f'{r["p50"] * 1e6:.0f}us'
+        p99 = '-' if r['p99'] is None else f'{r["p99"] * 1e6:.0f}us'
+        echo(f'{r["zones"]:>6} {r["wall"]:>7.2f}s {r["cpu"]:>7.2f}s {r["messages"]:>9} {r["rate"]:>9.0f} {r["commands"]:>7} {r["switches"]:>8} {p50:>9} {p99:>9} {r["rss"] / 2 ** 20:>6.1f}MB {r["zone_rss"] / 1024:>8.1f}')
 
 
 if __name__ == "__main__":
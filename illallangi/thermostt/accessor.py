@@ -0,0 +1,153 @@
+from jmespath import compile as jmespath_compile
+from jmespath.exceptions import JMESPathTypeError
+from jmespath.parser import ParsedResult
+
+
+def jmespath_type(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+
+def fields(node):
+    if node['type'] == 'field':
+        return [node['value']]
+    if node['type'] == 'subexpression' and all(c['type'] == 'field' for c in node['children']):
+        return [c['value'] for c in node['children']]
+    return None
+
+
+class Accessor(object):
+    def __init__(
+            self,
+            expression,
+            *args,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.expression = expression
+
+    def __str__(self):
+        return self.expression
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.expression!r})'
+
+
+class FieldPath(Accessor):
+    def __init__(
+            self,
+            expression,
+            fields,
+            *args,
+            **kwargs):
+        super().__init__(
+            expression,
+            *args,
+            **kwargs)
+        self.fields = tuple(fields)
+
+    @classmethod
+    def parse(cls, expression, node):
+        f = fields(node)
+        if f is None:
+            return None
+        return cls(expression, f)
+
+    def search(self, value):
+        for field in self.fields:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(field)
+        return value
+
+
+# values(<path>)[?<key>=='<literal>']|[0].<path>
+class IdLookup(Accessor):
+    def __init__(
+            self,
+            expression,
+            source,
+            key,
+            literal,
+            fields,
+            *args,
+            **kwargs):
+        super().__init__(
+            expression,
+            *args,
+            **kwargs)
+        self.source = FieldPath('.'.join(source), source)
+        self.key = key
+        self.literal = literal
+        self.path = FieldPath('.'.join(fields) or '@', fields)
+
+    @classmethod
+    def parse(cls, expression, node):
+        if node['type'] != 'pipe':
+            return None
+        left, right = node['children']
+
+        if left['type'] != 'filter_projection':
+            return None
+        function, identity, comparator = left['children']
+        if function['type'] != 'function_expression' or function['value'] != 'values' or len(function['children']) != 1:
+            return None
+        source = fields(function['children'][0])
+        if source is None or identity['type'] != 'identity':
+            return None
+        if comparator['type'] != 'comparator' or comparator['value'] != 'eq':
+            return None
+        key, literal = comparator['children']
+        if key['type'] != 'field' or literal['type'] != 'literal' or not isinstance(literal['value'], str):
+            return None
+
+        path = []
+        if right['type'] == 'subexpression':
+            index, *rest = right['children']
+            path = [fields(r) for r in rest]
+            if any(p is None for p in path):
+                return None
+            path = [f for p in path for f in p]
+        else:
+            index = right
+        if index['type'] != 'index_expression':
+            return None
+        identity, position = index['children']
+        if identity['type'] != 'identity' or position['type'] != 'index' or position['value'] != 0:
+            return None
+
+        return cls(expression, source, key['value'], literal['value'], path)
+
+    def search(self, value):
+        container = self.source.search(value)
+        if not isinstance(container, dict):
+            raise JMESPathTypeError('values', container, jmespath_type(container), ['object'])
+        for item in container.values():
+            if isinstance(item, dict) and item.get(self.key) == self.literal:
+                return self.path.search(item)
+        return None
+
+
+accessors = [FieldPath, IdLookup]
+
+
+def compile(expression):
+    if isinstance(expression, Accessor):
+        return expression
+
+    parsed = expression if isinstance(expression, ParsedResult) else jmespath_compile(expression)
+    for accessor in accessors:
+        result = accessor.parse(parsed.expression, parsed.parsed)
+        if result is not None:
+            return result
+    return parsed
@@ -0,0 +1,134 @@
+from time import perf_counter
+
+from . import metrics
+from .loadstate import LoadState
+
+
+Q0, Q1, QE = 1, 2, 4
+NONE = -1
+
+
+class BatchEngine(object):
+    def __init__(
+            self,
+            controllers=(),
+            *args,
+            capacity=64,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        try:
+            import numpy
+        except ImportError:
+            raise ValueError('Batch mode needs numpy, install illallangi-thermostt[batch]')
+        self.np = numpy
+        self.controllers = []
+        self.index = {}
+        self.dirty = {}
+        self.sensor = self.vmax = self.vmin = self.ready = self.load = self.target = self.pending = None
+        self.allocate(capacity)
+        for controller in controllers:
+            self.add(controller)
+
+    def __len__(self):
+        return len(self.controllers)
+
+    # Structure of arrays, one slot per zone, grown by doubling
+    def allocate(self, capacity):
+        np = self.np
+        n = len(self.controllers)
+        arrays = {
+            'sensor': np.full(capacity, np.nan),
+            'vmax': np.full(capacity, np.nan),
+            'vmin': np.full(capacity, np.nan),
+            'ready': np.zeros(capacity, dtype=bool),
+            'load': np.zeros(capacity, dtype=np.uint8),
+            'target': np.full(capacity, NONE, dtype=np.int8),
+            'pending': np.full(capacity, NONE, dtype=np.int8),
+        }
+        for name, array in arrays.items():
+            previous = getattr(self, name)
+            if previous is not None:
+                array[:n] = previous[:n]
+            setattr(self, name, array)
+
+    def add(self, controller):
+        if len(self.controllers) == len(self.sensor):
+            self.allocate(len(self.sensor) * 2)
+        self.index[id(controller)] = len(self.controllers)
+        self.controllers.append(controller)
+        self.mark(controller)
+
+    def remove(self, controller):
+        i = self.index.pop(id(controller))
+        last = self.controllers.pop()
+        self.dirty.pop(id(controller), None)
+        if last is controller:
+            return
+        n = len(self.controllers)
+        for array in (self.sensor, self.vmax, self.vmin, self.ready, self.load, self.target, self.pending):
+            array[i] = array[n]
+        self.controllers[i] = last
+        self.index[id(last)] = i
+
+    def mark(self, controller):
+        self.dirty[id(controller)] = controller
+
+    def gather(self, controller, i):
+        nan = self.np.nan
+        controller.commands.acknowledge(controller.load)
+        self.sensor[i] = nan if controller.sensor.value is None else controller.sensor.value
+        self.vmax[i] = nan if controller.vmax.value is None else controller.vmax.value
+        self.vmin[i] = nan if controller.vmin.value is None else controller.vmin.value
+        self.ready[i] = controller.healthy
+        # A load value can sit in more than one state list, so keep every match
+        self.load[i] = (Q0 if controller.load == LoadState.Q0 else 0) | \
+            (Q1 if controller.load == LoadState.Q1 else 0) | \
+            (QE if controller.load == LoadState.Qe else 0)
+        self.target[i] = NONE if controller.target is None else controller.target.value
+        self.pending[i] = NONE if controller.commands.pending is None else controller.commands.pending.value
+
+    def decide(self):
+        n = len(self.controllers)
+        sensor, vmax, vmin = self.sensor[:n], self.vmax[:n], self.vmin[:n]
+        load, target, pending = self.load[:n], self.target[:n], self.pending[:n]
+        # Comparisons against NaN are false, so a missing reading never switches Q0 or Q1
+        healthy = self.ready[:n] & (sensor == sensor) & (vmax == vmax) & (vmin == vmin)
+        up = healthy & (sensor >= vmax) & (((load & Q0) != 0) | (target != LoadState.Q1.value))
+        # decide() checks Q0 after switching to Q1, so a zone that just went up can still come down
+        down = healthy & (sensor <= vmin) & (((load & Q1) != 0) | up | (target != LoadState.Q0.value))
+        error = ~healthy & (((load & QE) == 0) | ((pending != NONE) & (pending != LoadState.Qe.value)))
+        return up, down, error
+
+    def run(self):
+        m = metrics.registry
+        start = perf_counter() if m is not None else None
+
+        dirty, self.dirty = self.dirty, {}
+        for key, controller in dirty.items():
+            self.gather(controller, self.index[key])
+
+        up, down, error = self.decide()
+        switched = []
+        for i in self.np.flatnonzero(up | down | error).tolist():
+            controller = self.controllers[i]
+            load = controller.load
+            if down[i]:
+                controller.switch(LoadState.Q0, load.q0_topic, load.q0_value)
+            elif up[i]:
+                controller.switch(LoadState.Q1, load.q1_topic, load.q1_value)
+            else:
+                controller.switch(LoadState.Qe, load.qe_topic, load.qe_value)
+            self.target[i] = controller.target.value
+            self.pending[i] = controller.commands.pending.value
+            switched.append(controller)
+
+        if m is not None:
+            m.observe('decision', perf_counter() - start)
+
+        for controller in switched:
+            dirty[id(controller)] = controller
+        for controller in dirty.values():
+            controller.publish()
+        return dirty.values()
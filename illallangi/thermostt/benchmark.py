@@ -0,0 +1,185 @@
+from datetime import datetime
+from itertools import cycle
+from json import dumps, loads
+from os.path import exists
+from platform import python_version
+from time import perf_counter_ns
+from timeit import Timer
+
+from jmespath import compile as jmespath_compile
+
+from . import codec
+from .accessor import compile
+from .config import controller
+from .fakeclient import FakeClient
+from .message import Message
+
+
+payloads = {
+    'sensor': {
+        'payload': {
+            'Time': '2020-09-12T10:15:42',
+            **{
+                f'DS18B20-{i}': {
+                    'Id': f'01144A0CB2{i:02X}',
+                    'Temperature': 20.0 + i / 10,
+                }
+                for i in range(1, 9)
+            },
+            'TempUnit': 'C',
+        },
+    },
+    'state': {
+        'payload': {
+            'Time': '2020-09-12T10:15:42',
+            'Uptime': '0T01:02:03',
+            'UptimeSec': 3723,
+            'Heap': 27,
+            'SleepMode': 'Dynamic',
+            'Sleep': 50,
+            'LoadAvg': 19,
+            'MqttCount': 1,
+            'POWER': 'ON',
+            'Wifi': {
+                'AP': 1,
+                'SSId': 'thermostt',
+                'BSSId': '00:00:00:00:00:00',
+                'Channel': 6,
+                'RSSI': 80,
+                'Signal': -60,
+                'LinkCount': 1,
+                'Downtime': '0T00:00:03',
+            },
+        },
+    },
+    'lwt': {
+        'payload': 'Online',
+    },
+    'vmax': {
+        'payload': 22.5,
+    },
+}
+
+filters = [
+    ("values(payload)[?Id=='01144A0CB201']|[0].Temperature", 'sensor'),
+    ("values(payload)[?Id=='01144A0CB208']|[0].Temperature", 'sensor'),
+    ('payload.POWER', 'state'),
+    ('payload.Wifi.RSSI', 'state'),
+    ('payload', 'lwt'),
+    ('payload', 'vmax'),
+]
+
+
+def measure(function, iterations, repeat=5):
+    return min(Timer(function).repeat(repeat=repeat, number=iterations)) / iterations
+
+
+def benchmark_filters(iterations=10000):
+    for expression, name in filters:
+        payload = payloads[name]
+        generic = jmespath_compile(expression)
+        compiled = compile(expression)
+        if generic.search(payload) != compiled.search(payload):
+            raise AssertionError(f'{expression} returned {compiled.search(payload)} instead of {generic.search(payload)}')
+        yield (
+            expression,
+            type(compiled).__name__,
+            measure(lambda: generic.search(payload), iterations),
+            measure(lambda: compiled.search(payload), iterations),
+        )
+
+
+recorded = [
+    ('tele/tasmota_sensors/SENSOR', payloads['sensor']['payload']),
+    ('tele/tasmota_load/STATE', payloads['state']['payload']),
+    ('tele/tasmota_load/LWT', payloads['lwt']['payload']),
+    ('tele/tasmota_sensors/LWT', payloads['lwt']['payload']),
+    ('cmnd/benchmark/vmax', payloads['vmax']['payload']),
+    ('cmnd/benchmark/vmin', 19.5),
+]
+
+
+class FakeMessage(object):
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload if isinstance(payload, bytes) else dumps(payload).encode('UTF-8')
+
+
+def zone():
+    c = controller(
+        'localhost',
+        1883,
+        name='benchmark',
+        load='tasmota_load',
+        sensor='01144A0CB201',
+        sensor_health='tasmota_sensors')
+    c.client = FakeClient()
+    for msg in messages():
+        c.on_message(c.client, None, msg)
+    return c
+
+
+def messages():
+    return [FakeMessage(topic, payload) for topic, payload in recorded]
+
+
+def sample(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = perf_counter_ns()
+        function()
+        timings.append(perf_counter_ns() - start)
+    timings.sort()
+    return {
+        'ops': iterations / (sum(timings) / 1e9),
+        'p50': timings[len(timings) // 2],
+        'p99': timings[min(len(timings) - 1, len(timings) * 99 // 100)],
+    }
+
+
+def stages(c):
+    sensor = messages()[0]
+    document = Message.wrap(sensor).document
+
+    ring = cycle(messages())
+
+    return {
+        'decode': lambda: Message.wrap(sensor).document,
+        'match': lambda: c.dispatcher.subscriptions.match(sensor.topic),
+        'filter': lambda: c.sensor.jmespath.search(document),
+        'decision': c.decide,
+        'serialise': c.format,
+        'publish': c.republish,
+        'pipeline': lambda: c.on_message(c.client, None, next(ring)),
+    }
+
+
+def benchmark_pipeline(iterations=10000):
+    for stage, function in stages(zone()).items():
+        yield stage, sample(function, iterations)
+
+
+def load_history(path):
+    if not path or not exists(path):
+        return []
+    with open(path, 'r') as fh:
+        return [loads(line) for line in fh if line.strip()]
+
+
+def save_history(path, results):
+    with open(path, 'a') as fh:
+        fh.write(dumps({
+            'time': datetime.utcnow().isoformat(),
+            'python': python_version(),
+            'json': codec.backend,
+            'results': results,
+        }) + '\n')
+
+
+def regressions(previous, results, tolerance):
+    for stage, result in results.items():
+        before = previous.get('results', {}).get(stage)
+        if before and result['ops'] < before['ops'] * (1 - tolerance):
+            yield stage, before['ops'], result['ops']
@@ -0,0 +1,13 @@
+from time import monotonic as system_monotonic, time as system_time
+
+
+# Replay pins this to each recorded timestamp, so deadlines follow the recording rather than the wall clock
+current = None
+
+
+def monotonic():
+    return system_monotonic() if current is None else current
+
+
+def time():
+    return system_time() if current is None else current
@@ -0,0 +1,22 @@
+from importlib import import_module
+
+
+backends = ['orjson', 'ujson', 'json']
+backend = None
+loads = None
+
+
+def use(name=None):
+    global backend, loads
+    for candidate in [name] if name and name != 'auto' else backends:
+        try:
+            module = import_module(candidate)
+        except ImportError:
+            continue
+        backend = candidate
+        loads = module.loads
+        return backend
+    raise ValueError(f'JSON backend {name} is not installed')
+
+
+use()
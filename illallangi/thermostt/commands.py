@@ -0,0 +1,61 @@
+from loguru import logger
+
+from .clock import monotonic
+
+
+class CommandTracker(object):
+    __slots__ = ('initial', 'cap', 'qos', 'pending', 'topic', 'value', 'attempts', 'retry', 'timer')
+
+    def __init__(
+            self,
+            initial=10.0,
+            cap=300.0,
+            qos=1):
+        self.initial = initial
+        self.cap = cap
+        self.qos = qos
+        self.timer = None
+        self.clear()
+
+    def clear(self):
+        self.pending = None
+        self.topic = None
+        self.value = None
+        self.attempts = 0
+        self.retry = None
+        self.arm()
+
+    def arm(self):
+        if self.timer is not None:
+            self.timer.rearm(self.retry)
+
+    def delay(self):
+        return min(self.initial * 2 ** (self.attempts - 1), self.cap)
+
+    def send(self, client, target, topic, value, now=None):
+        now = monotonic() if now is None else now
+        self.pending = target
+        self.topic = topic
+        self.value = value
+        self.attempts = 1
+        client.publish(topic, value, qos=self.qos, retain=False)
+        self.retry = now + self.delay()
+        self.arm()
+
+    def acknowledge(self, load):
+        if self.pending is not None and load == self.pending:
+            self.clear()
+
+    def tick(self, client, now=None):
+        if self.pending is None:
+            return False
+        now = monotonic() if now is None else now
+        if now < self.retry:
+            self.arm()
+            return False
+        self.attempts += 1
+        logger.warning('No acknowledgement for {} after {} attempts, resending {}: {}', self.pending, self.attempts - 1, self.topic, self.value)
+        client.publish(self.topic, self.value, qos=self.qos, retain=False)
+        self.retry = now + self.delay()
+        self.arm()
+        return True
@@ -0,0 +1,60 @@
+from loguru import logger
+
+from .accessor import compile
+from .clock import monotonic
+from .logs import Repeats
+from .timerwheel import Timer
+
+
+class Component(object):
+    __slots__ = ('topic', 'jmespath', 'max_age', 'qos', 'timer', 'updated', 'listener', 'errors', '_value')
+
+    def __init__(
+            self,
+            *args,
+            topic,
+            jmespath,
+            max_age=None,
+            qos=0,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.topic = topic
+        self.jmespath = compile(jmespath)
+        self.max_age = max_age
+        self.qos = qos
+        self.timer = Timer(self.expire) if max_age else None
+        self.updated = None
+        self.listener = None
+        self.errors = Repeats()
+        self._value = None
+        logger.debug('Subscribed to {} with jmespath filter {}', self.topic, self.jmespath)
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self.change(value)
+        if self.timer is not None:
+            self.timer.rearm(monotonic() + self.max_age)
+
+    @property
+    def ready(self):
+        return self._value is not None
+
+    # Only a flip in readiness is reported, so the controller can keep a running count
+    def change(self, value):
+        ready = self.ready
+        self._value = value
+        if self.listener is not None and self.ready is not ready:
+            self.listener(self)
+
+    def expire(self, now):
+        logger.warning('No update on {} for {}s, expiring {}', self.topic, self.max_age, self.value)
+        self.change(None)
+
+    def __str__(self):
+        return str(self.value)
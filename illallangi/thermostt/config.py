@@ -0,0 +1,261 @@
+from difflib import get_close_matches
+from inspect import signature
+from zlib import crc32
+
+from yaml import safe_load
+
+
+from .commands import CommandTracker
+from .controller import Controller
+from .health import Health
+from .load import Load
+from .publisher import PublishPolicy
+from .sensor import Sensor
+from .smoothing import smoothing
+from .vmax import VMax
+from .vmin import VMin
+
+
+DURATIONS = ('_max_age', '_heartbeat', '_interval', '_retry', '_retry_cap')
+
+
+def number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def split(value):
+    if value is None or isinstance(value, list):
+        return value
+    return str(value).split(',')
+
+
+def controller(
+        server,
+        port,
+        *,
+        load,
+        sensor,
+        sensor_health=None,
+        sensor_delta=0.0,
+        sensor_smoothing=None,
+        sensor_max_age=None,
+        sensor_qos=0,
+        sensor_topic=None,
+        sensor_jmespath=None,
+        sensor_health_topic=None,
+        sensor_health_jmespath=None,
+        sensor_health_healthy=None,
+        sensor_health_max_age=None,
+        sensor_health_qos=0,
+        vmax=None,
+        vmax_delta=0.0,
+        vmax_topic=None,
+        vmax_jmespath=None,
+        vmax_max_age=None,
+        vmax_qos=0,
+        vmin=None,
+        vmin_delta=0.0,
+        vmin_topic=None,
+        vmin_jmespath=None,
+        vmin_max_age=None,
+        vmin_qos=0,
+        q0=None,
+        q0_topic=None,
+        q0_value=None,
+        q1=None,
+        q1_topic=None,
+        q1_value=None,
+        qe=None,
+        qe_topic=None,
+        qe_value=None,
+        load_topic=None,
+        load_jmespath=None,
+        load_max_age=None,
+        load_qos=0,
+        load_health=None,
+        load_health_topic=None,
+        load_health_jmespath=None,
+        load_health_healthy=None,
+        load_health_max_age=None,
+        load_health_qos=0,
+        name=None,
+        state_topic=None,
+        lwt_topic=None,
+        state_heartbeat=60.0,
+        state_interval=0.0,
+        state_retain=False,
+        state_format=None,
+        recorder=None,
+        store=None,
+        conflate=0,
+        session=None,
+        history=None,
+        command_retry=10.0,
+        command_retry_cap=300.0):
+    return Controller(
+        server,
+        port,
+        Load(
+            load,
+            q0=split(q0),
+            q0_topic=q0_topic,
+            q0_value=q0_value,
+            q1=split(q1),
+            q1_topic=q1_topic,
+            q1_value=q1_value,
+            qe=split(qe),
+            qe_topic=qe_topic,
+            qe_value=qe_value,
+            topic=load_topic,
+            jmespath=load_jmespath,
+            max_age=load_max_age,
+            qos=load_qos),
+        Sensor(
+            sensor,
+            topic=sensor_topic,
+            jmespath=sensor_jmespath,
+            delta=sensor_delta or 0.0,
+            smoothing=smoothing(sensor_smoothing),
+            max_age=sensor_max_age,
+            qos=sensor_qos),
+        VMax(
+            vmax or name,
+            topic=vmax_topic,
+            jmespath=vmax_jmespath,
+            delta=vmax_delta or 0.0,
+            max_age=vmax_max_age,
+            qos=vmax_qos),
+        VMin(
+            vmin or name,
+            topic=vmin_topic,
+            jmespath=vmin_jmespath,
+            delta=vmin_delta or 0.0,
+            max_age=vmin_max_age,
+            qos=vmin_qos),
+        [
+            Health(
+                sensor_health or sensor,
+                topic=sensor_health_topic,
+                jmespath=sensor_health_jmespath,
+                healthy=split(sensor_health_healthy),
+                max_age=sensor_health_max_age,
+                qos=sensor_health_qos),
+            Health(
+                load_health or load,
+                topic=load_health_topic,
+                jmespath=load_health_jmespath,
+                healthy=split(load_health_healthy),
+                max_age=load_health_max_age,
+                qos=load_health_qos),
+        ],
+        name=name,
+        lwt_topic=lwt_topic,
+        state_topic=state_topic,
+        policy=PublishPolicy(
+            heartbeat=state_heartbeat,
+            interval=state_interval,
+            retain=state_retain),
+        state_format=state_format,
+        recorder=recorder,
+        store=store,
+        conflate=conflate,
+        session=session,
+        history=history,
+        commands=CommandTracker(
+            initial=command_retry,
+            cap=command_retry_cap))
+
+
+def shard(name, shards):
+    return crc32(str(name).encode('UTF-8')) % shards
+
+
+def options():
+    return [
+        name.replace('_', '-')
+        for name in signature(controller).parameters
+        if name not in ('server', 'port', 'recorder', 'store', 'conflate', 'session', 'history')
+    ]
+
+
+def zone(config, index=0):
+    if not isinstance(config, dict):
+        raise ValueError(f'zone {index}: expected a mapping')
+    known = options()
+    for k in config:
+        if str(k).replace('_', '-') not in known:
+            suggestion = get_close_matches(str(k).replace('_', '-'), known, 1)
+            raise ValueError(f'zone {index}: unknown option {k}' + (f', did you mean {suggestion[0]}?' if suggestion else ''))
+    result = {
+        str(k).replace('-', '_'): config[k]
+        for k in config
+    }
+    for k in ('load', 'sensor'):
+        if not result.get(k):
+            raise ValueError(f'zone {index}: {k} is required')
+    # Values are checked here, a wrong type would otherwise only fail inside a message callback
+    for k, v in result.items():
+        if k.endswith('_qos') and v not in (0, 1, 2):
+            raise ValueError(f'zone {index}: {k} must be 0, 1 or 2')
+        if v is None:
+            continue
+        if k.endswith('_delta') and not number(v):
+            raise ValueError(f'zone {index}: {k} must be a number')
+        if k.endswith(DURATIONS) and not (number(v) and v >= 0):
+            raise ValueError(f'zone {index}: {k} must be a non-negative number')
+        if k.endswith('_retain') and not isinstance(v, bool):
+            raise ValueError(f'zone {index}: {k} must be true or false')
+        if k.endswith('_smoothing'):
+            try:
+                smoothing(v)
+            except ValueError as e:
+                raise ValueError(f'zone {index}: {k}: {e}')
+    return result
+
+
+def read(path):
+    if str(path).endswith('.toml'):
+        try:
+            from tomllib import load
+        except ImportError:
+            try:
+                from tomli import load
+            except ImportError:
+                raise ValueError(f'{path}: reading TOML needs Python 3.11 or the tomli package')
+        with open(path, 'rb') as fh:
+            return load(fh)
+    with open(path, 'r') as fh:
+        return safe_load(fh) or {}
+
+
+def load_config(path):
+    config = read(path)
+
+    if not isinstance(config, dict):
+        raise ValueError(f'{path}: expected a mapping at the top level')
+
+    for k in config:
+        if str(k).replace('_', '-') not in ('server', 'port', 'name', 'lwt-topic', 'zones'):
+            raise ValueError(f'{path}: unknown option {k}')
+
+    zones = config.get('zones') or []
+    if not isinstance(zones, list):
+        raise ValueError(f'{path}: expected zones to be a list')
+
+    try:
+        zones = [zone(z, i) for i, z in enumerate(zones)]
+    except ValueError as e:
+        raise ValueError(f'{path}: {e}')
+
+    names = [z.get('name') for z in zones]
+    duplicates = sorted({str(n) for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f'{path}: zone names must be unique, found {", ".join(duplicates)} more than once')
+
+    return {
+        'server': config.get('server'),
+        'port': config.get('port'),
+        'name': config.get('name'),
+        'lwt_topic': config.get('lwt-topic', config.get('lwt_topic')),
+        'zones': zones,
+    }
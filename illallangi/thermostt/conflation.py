@@ -0,0 +1,39 @@
+class ConflationQueue(object):
+    __slots__ = ('maxsize', 'passthrough', 'pending', 'received', 'superseded', 'dropped', 'drained')
+
+    def __init__(
+            self,
+            maxsize=10000,
+            passthrough=()):
+        self.maxsize = maxsize
+        self.passthrough = frozenset(passthrough)
+        self.pending = {}
+        self.received = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.drained = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    # A newer message replaces the pending one in place, keeping its turn in the queue
+    # Requests are not state, so each one queues under its own key and is answered in turn
+    def put(self, msg):
+        self.received += 1
+        key = msg.topic
+        if key in self.passthrough:
+            key = (key, self.received)
+        if key in self.pending:
+            self.superseded += 1
+        elif len(self.pending) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self.pending[key] = msg
+        return True
+
+    def drain(self, handle):
+        pending, self.pending = self.pending, {}
+        for msg in pending.values():
+            handle(msg)
+        self.drained += len(pending)
+        return len(pending)
@@ -1,19 +1,20 @@
 from datetime import datetime
-from functools import cached_property
-from json import dumps, loads
-from re import match
+from functools import cached_property, partial
+from time import perf_counter
 
 from loguru import logger
 
-from paho.mqtt.client import Client
-
-from .healthstate import HealthState
+from . import metrics
+from .commands import CommandTracker
+from .conflation import ConflationQueue
+from .dispatcher import Dispatcher
+from .history import HistoryRequests
 from .loadstate import LoadState
-
-
-# https://codegolf.stackexchange.com/a/188404
-def mqtt_topic_match(a, b):
-    return bool(match(b.translate({43: "[^/]+", 35: ".+"}), a))
+from .loop import loop_async, loop_forever
+from .publisher import Publisher, PublishPolicy
+from .session import SessionPolicy
+from .state import State
+from .timerwheel import Timer
 
 
 class Controller(object):
@@ -30,6 +31,14 @@ class Controller(object):
             name=None,
             lwt_topic=None,
             state_topic=None,
+            policy=None,
+            state_format=None,
+            recorder=None,
+            commands=None,
+            store=None,
+            conflate=0,
+            session=None,
+            history=None,
             **kwargs):
         super().__init__(
             *args,
@@ -48,108 +57,171 @@ class Controller(object):
         self.lwt_topic = lwt_topic or f'tele/{self.name}/LWT'.replace('.', '_')
         self.state_topic = state_topic or f'tele/{self.name}/STATE'.replace('.', '_')
 
+        self.target = None
+        self.recorder = recorder
+        self.store = store
+        self.history = history
+        self.queue = ConflationQueue(conflate, passthrough=self.requests) if conflate else None
+        self.session = session or SessionPolicy()
+        self.session.identify(self.name)
+        self.commands = commands or CommandTracker()
+        self.state = State(('sensor', 'vmax', 'vmin', 'load', 'target'), format=state_format)
+
+        self.policy = policy or PublishPolicy()
+        self.lwt_publisher = Publisher(self.lwt_topic, self.policy)
+        # The publisher compares state versions to spot a change, the payload is always the current state
+        self.state_publisher = Publisher(self.state_topic, self.policy, format=lambda version: self.format())
+
+        self.lwt_publisher.timer = Timer(lambda now: self.lwt_publisher.tick(self.client, now))
+        self.state_publisher.timer = Timer(lambda now: self.state_publisher.tick(self.client, now))
+        self.commands.timer = Timer(lambda now: self.commands.tick(self.client, now))
+
+        # Components report readiness flips, so healthy is a counter check rather than a scan
+        on_change = self.on_change
+        for component in self.components:
+            component.listener = on_change
+        self.not_ready = sum(not component.ready for component in self.components)
+
     def __str__(self):
-        o = {
-            'time': datetime.utcnow().isoformat(),
-            'sensor': self.sensor.value,
-            'vmax': self.vmax.value,
-            'vmin': self.vmin.value,
-            'load': self.load.value,
-            'target': self.target.name if 'target' in self.__dict__ and self.target != self.load else None,
-        }
-
-        return dumps({
-            k: o[k]
-            for k in o
-            if o[k] is not None
-        })
+        self.patch()
+        return self.format()
+
+    def patch(self):
+        self.state.patch('sensor', self.sensor.value)
+        self.state.patch('vmax', self.vmax.value)
+        self.state.patch('vmin', self.vmin.value)
+        self.state.patch('load', self.load.value)
+        self.state.patch('target', self.target.name if self.target is not None and self.target != self.load else None)
+        return self.state.version
+
+    def snapshot(self):
+        self.patch()
+        return self.state.snapshot()
+
+    def format(self):
+        return self.state.serialise(time=datetime.utcnow().isoformat())
+
+    def on_change(self, component):
+        self.not_ready += -1 if component.ready else 1
 
     @property
     def healthy(self):
-        return self.load.value is not None and \
-            self.sensor.value is not None and \
-            self.vmax.value is not None and \
-            self.vmin.value is not None and \
-            HealthState.Unhealthy not in (h.value for h in self.health)
+        return self.not_ready == 0
+
+    @property
+    def components(self):
+        return [
+            self.load,
+            self.sensor,
+            self.vmax,
+            self.vmin,
+            *self.health,
+        ]
+
+    @property
+    def timers(self):
+        return [
+            *(component.timer for component in self.components if component.timer is not None),
+            self.lwt_publisher.timer,
+            self.state_publisher.timer,
+            self.commands.timer,
+        ]
+
+    @property
+    def topics(self):
+        return list(dict.fromkeys(component.topic for component in self.components))
+
+    @property
+    def requests(self):
+        return [f'cmnd/{self.name}/history'.replace('.', '_')] if self.history is not None else []
+
+    @cached_property
+    def dispatcher(self):
+        dispatcher = Dispatcher([self], recorder=self.recorder, store=self.store, history=self.history)
+        if self.history is not None:
+            topic = f'{self.name}/history'.replace('.', '_')
+            dispatcher.bind('history', f'cmnd/{topic}', HistoryRequests(f'cmnd/{topic}', f'stat/{topic}', [self], self))
+        return dispatcher
 
     @cached_property
     def client(self):
-        c = Client()
+        c = self.session.client(self.name)
         c.on_connect = self.on_connect
         c.on_message = self.on_message
-        c.will_set(self.lwt_topic, 'Offline', qos=0, retain=False)
+        c.will_set(self.lwt_topic, 'Offline', qos=self.policy.qos, retain=self.policy.retain)
         return c
 
     def connect(self):
-        self.client.connect(self.server, self.port, 60)
-        self.client.publish(self.lwt_topic, 'Online' if self.healthy else 'Error', qos=0, retain=False)
-        return self.client
+        return self.session.connect(self.client, self.server, self.port)
 
     def loop_forever(self):
-        self.client.loop_forever()
+        loop_forever(self.client, self.tick, drain=self.drain if self.queue is not None else None, session=self.session)
+
+    async def loop_async(self):
+        await loop_async(self.client, self.connect, self.tick, drain=self.drain if self.queue is not None else None, session=self.session)
+
+    def drain(self):
+        return self.queue.drain(partial(self.dispatcher.on_message, self.client, None))
+
+    def tick(self, now=None):
+        self.dispatcher.tick(now)
 
     def on_connect(self, client, userdata, flags, rc):
         logger.info('Connected with result code {}', rc)
-        self.client.subscribe(self.load.topic)
-        self.client.subscribe(self.sensor.topic)
-        self.client.subscribe(self.vmax.topic)
-        self.client.subscribe(self.vmin.topic)
-        for health in self.health:
-            self.client.subscribe(health.topic)
+        if rc == 0:
+            self.session.reset()
+        self.republish()
+        self.session.subscribe(self.client, self.dispatcher.topic_qos, flags)
 
     def on_message(self, client, userdata, msg):
-        try:
-            decoded_payload = msg.payload.decode('UTF-8')
-        except Exception as e:
-            logger.error('Error decoding payload: {}', str(e))
+        if self.queue is not None:
+            self.queue.put(msg)
             return
+        self.dispatcher.on_message(client, userdata, msg)
 
-        try:
-            payload = {'payload': loads(decoded_payload)}
-        except ValueError:
-            payload = {'payload': decoded_payload}
-        except Exception as e:
-            logger.error('Error decoding json: {}', str(e))
+    def update(self):
+        m = metrics.registry
+        if m is None:
+            self.decide()
+            self.publish()
             return
 
-        logger.trace(payload)
+        start = perf_counter()
+        self.decide()
+        decided = perf_counter()
+        self.publish()
+        m.observe('decision', decided - start)
+        m.observe('publish', perf_counter() - decided)
 
-        if mqtt_topic_match(msg.topic, self.load.topic):
-            self.load.on_message(payload)
-
-        if mqtt_topic_match(msg.topic, self.sensor.topic):
-            self.sensor.on_message(payload)
-
-        if mqtt_topic_match(msg.topic, self.vmax.topic):
-            self.vmax.on_message(payload)
-
-        if mqtt_topic_match(msg.topic, self.vmin.topic):
-            self.vmin.on_message(payload)
-
-        for health in self.health:
-            if mqtt_topic_match(msg.topic, health.topic):
-                health.on_message(payload)
+    def decide(self):
+        self.commands.acknowledge(self.load)
 
         if self.healthy:
             if self.sensor.value >= self.vmax.value and \
                (self.load == LoadState.Q0 or self.target != LoadState.Q1):
-                self.target = LoadState.Q1
-                logger.success('Switching to Q1 with {}: {}', self.load.q1_topic, self.load.q1_value)
-                self.client.publish(self.load.q1_topic, self.load.q1_value, qos=0, retain=False)
+                self.switch(LoadState.Q1, self.load.q1_topic, self.load.q1_value)
 
             if self.sensor.value <= self.vmin.value and \
                (self.load == LoadState.Q1 or self.target != LoadState.Q0):
-                self.target = LoadState.Q0
-                logger.success('Switching to Q0 with {}: {}', self.load.q0_topic, self.load.q0_value)
-                self.client.publish(self.load.q0_topic, self.load.q0_value, qos=0, retain=False)
-        elif self.load != LoadState.Qe:
-            self.target = LoadState.Qe
-            logger.success('Switching to Qe with {}: {}', self.load.qe_topic, self.load.qe_value)
-            self.client.publish(self.load.qe_topic, self.load.qe_value, qos=0, retain=False)
-
-        self.client.publish(self.lwt_topic, 'Online' if self.healthy else 'Error', qos=0, retain=False)
-        self.client.publish(
-            self.state_topic,
-            str(self),
-            qos=0,
-            retain=False)
+                self.switch(LoadState.Q0, self.load.q0_topic, self.load.q0_value)
+        # A command still in flight from before the zone went unhealthy is replaced, so it is never retried
+        elif self.load != LoadState.Qe or self.commands.pending not in (None, LoadState.Qe):
+            self.switch(LoadState.Qe, self.load.qe_topic, self.load.qe_value)
+
+    def switch(self, target, topic, value):
+        if self.commands.pending is target:
+            return
+        self.target = target
+        if metrics.registry is not None:
+            metrics.registry.switch(target.name)
+        logger.success('Switching to {} with {}: {}', target, topic, value)
+        self.commands.send(self.client, target, topic, value)
+
+    def republish(self, now=None):
+        self.lwt_publisher.reset()
+        self.state_publisher.reset()
+        self.publish(now)
+
+    def publish(self, now=None):
+        self.lwt_publisher.publish(self.client, 'Online' if self.healthy else 'Error', now)
+        self.state_publisher.publish(self.client, self.patch(), now)
@@ -0,0 +1,64 @@
+from time import perf_counter
+
+from . import metrics
+from .logs import Repeats
+
+
+class SensorDemux(object):
+    def __init__(
+            self,
+            topic,
+            source,
+            key,
+            *args,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.topic = topic
+        self.source = source
+        self.key = key
+        self.sensors = {}
+        self.errors = Repeats()
+
+    def add(self, sensor, controller):
+        self.sensors.setdefault(sensor.jmespath.literal, []).append((sensor, controller))
+
+    def remove(self, sensor):
+        literal = sensor.jmespath.literal
+        self.sensors[literal] = [s for s in self.sensors.get(literal, []) if s[0] is not sensor]
+        if not self.sensors[literal]:
+            del self.sensors[literal]
+
+    def __len__(self):
+        return sum(len(s) for s in self.sensors.values())
+
+    def dispatch(self, payload):
+        m = metrics.registry
+        start = perf_counter() if m is not None else None
+
+        container = self.source.search(payload)
+        if not isinstance(container, dict):
+            self.errors.error('Error filtering: expected an object at {}, received {}', self.source, type(container).__name__)
+            return ()
+
+        controllers = []
+        seen = set()
+        for item in container.values():
+            if not isinstance(item, dict):
+                continue
+            try:
+                literal = item.get(self.key)
+                sensors = self.sensors.get(literal)
+            except TypeError:
+                continue
+            if sensors is None or literal in seen:
+                continue
+            seen.add(literal)
+            for sensor, controller in sensors:
+                sensor.on_value(sensor.jmespath.path.search(item))
+                controllers.append(controller)
+
+        if m is not None:
+            m.observe('filter', perf_counter() - start)
+        return controllers
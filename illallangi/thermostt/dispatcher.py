@@ -0,0 +1,160 @@
+from time import perf_counter
+
+from loguru import logger
+
+from . import logs, metrics
+from .accessor import IdLookup
+from .demux import SensorDemux
+from .message import Message
+from .recorder import decision
+from .sensor import Sensor
+from .timerwheel import TimerWheel
+from .topictrie import TopicTrie
+
+
+class Binding(object):
+    __slots__ = ('controller', 'component')
+
+    def __init__(self, controller, component):
+        self.controller = controller
+        self.component = component
+
+    def dispatch(self, payload):
+        self.component.on_message(payload)
+        return (self.controller,)
+
+
+class Dispatcher(object):
+    def __init__(
+            self,
+            controllers,
+            *args,
+            recorder=None,
+            store=None,
+            batch=None,
+            history=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.recorder = recorder
+        self.batch = batch
+        self.history = history
+        self.subscriptions = TopicTrie()
+        self.demuxes = {}
+        self.bindings = {}
+        self.wheel = TimerWheel()
+        if store is not None:
+            self.wheel.add(store.timer)
+        for controller in controllers:
+            self.add(controller)
+
+    @property
+    def topics(self):
+        return list(dict.fromkeys(
+            topic
+            for topic, _, _ in self.bindings.values()
+        ))
+
+    # A topic shared by several components is subscribed once, at the highest QoS any of them asked for
+    @property
+    def topic_qos(self):
+        qos = {}
+        for topic, _, q in self.bindings.values():
+            qos[topic] = max(q, qos.get(topic, 0))
+        return qos
+
+    def add(self, controller):
+        for component in controller.components:
+            if isinstance(component, Sensor) and isinstance(component.jmespath, IdLookup):
+                key = (component.topic, component.jmespath.source.fields, component.jmespath.key)
+                handler = self.demuxes.get(key)
+                if handler is None:
+                    handler = self.demuxes[key] = SensorDemux(component.topic, component.jmespath.source, component.jmespath.key)
+                handler.add(component, controller)
+            else:
+                handler = Binding(controller, component)
+            self.subscriptions.add(component.topic, handler)
+            self.bindings[id(component)] = (component.topic, handler, component.qos)
+            if component.timer is not None:
+                component.timer.owner = controller
+        for timer in controller.timers:
+            self.wheel.add(timer)
+        if self.history is not None:
+            self.history.attach(controller)
+        if self.batch is not None:
+            self.batch.add(controller)
+
+    # Handlers that are not zone components, keyed by name rather than component id
+    def bind(self, key, topic, handler, qos=0):
+        self.subscriptions.add(topic, handler)
+        self.bindings[key] = (topic, handler, qos)
+
+    def remove(self, controller):
+        for component in controller.components:
+            topic, handler, _ = self.bindings.pop(id(component))
+            if isinstance(handler, SensorDemux):
+                handler.remove(component)
+                if len(handler):
+                    continue
+                del self.demuxes[topic, handler.source.fields, handler.key]
+            self.subscriptions.remove(topic, handler)
+        for timer in controller.timers:
+            self.wheel.remove(timer)
+        if self.batch is not None:
+            self.batch.remove(controller)
+
+    def update(self, controllers):
+        if self.batch is None:
+            for controller in controllers:
+                controller.update()
+            return
+        # Decisions wait for the next tick, when every marked zone is evaluated at once
+        for controller in controllers:
+            self.batch.mark(controller)
+
+    def tick(self, now=None):
+        controllers = {}
+        for timer in self.wheel.advance(now):
+            if timer.owner is not None:
+                controllers[id(timer.owner)] = timer.owner
+        self.update(controllers.values())
+        if self.batch is not None:
+            self.batch.run()
+        logs.tick(now)
+        return controllers.values()
+
+    def on_message(self, client, userdata, msg):
+        message = Message.wrap(msg)
+        handlers = self.subscriptions.match(message.topic)
+        m = metrics.registry
+        if not handlers:
+            if m is not None:
+                m.count('unmatched')
+            return ()
+
+        if m is None:
+            payload = message.document
+        else:
+            start = perf_counter()
+            payload = message.document
+            m.observe('decode', perf_counter() - start)
+        if payload is None:
+            if self.recorder is not None:
+                self.recorder.record(message.topic, message.payload)
+            return ()
+
+        if logs.tracing:
+            logger.trace(payload)
+
+        controllers = {}
+        for handler in handlers:
+            for controller in handler.dispatch(payload):
+                controllers[id(controller)] = controller
+
+        self.update(controllers.values())
+
+        if self.recorder is not None:
+            self.recorder.record(message.topic, message.payload, decision(controllers.values()))
+
+        return controllers.values()
@@ -0,0 +1,10 @@
+class FakeClient(object):
+    def __init__(self):
+        self.published = 0
+        self.subscribed = 0
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published += 1
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed += 1 if isinstance(topic, str) else len(topic)
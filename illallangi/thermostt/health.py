@@ -1,12 +1,16 @@
-from jmespath import compile
-from jmespath.parser import ParsedResult
+from time import perf_counter
 
 from loguru import logger
 
+from . import metrics
+from .clock import monotonic
+from .component import Component
 from .healthstate import HealthState
 
 
-class Health(object):
+class Health(Component):
+    __slots__ = ('healthy',)
+
     def __init__(
             self,
             name,
@@ -17,37 +21,40 @@ class Health(object):
             **kwargs):
         super().__init__(
             *args,
+            topic=topic or f'tele/{name}/LWT',
+            jmespath=jmespath or 'payload',
             **kwargs)
-        self.topic = topic or f'tele/{name}/LWT'
-        self.jmespath = jmespath or 'payload'
-        self.jmespath = compile(self.jmespath) if not isinstance(self.jmespath, ParsedResult) else self.jmespath
         self.healthy = healthy or ['Online']
-        logger.debug('Subscribed to {} with jmespath filter {}', self.topic, self.jmespath)
 
     @property
-    def value(self):
-        return self._value if '_value' in self.__dict__ else None
-
-    @value.setter
-    def value(self, value):
-        self._value = value
+    def ready(self):
+        return self._value is not HealthState.Unhealthy
 
-    def __str__(self):
-        return str(self.value)
+    # A silent health topic is treated the same as an explicit failure
+    def expire(self, now):
+        logger.warning('No update on {} for {}s, marking unhealthy', self.topic, self.max_age)
+        self.change(HealthState.Unhealthy)
 
     def on_message(self, payload):
+        m = metrics.registry
+        if m is not None:
+            m.count('health')
+            start = perf_counter()
         try:
             filtered_json = self.jmespath.search(payload)
         except Exception as e:
-            logger.error('Error filtering: {}', str(e))
+            self.errors.error('Error filtering: {}', str(e))
             return
+        if m is not None:
+            m.observe('filter', perf_counter() - start)
 
         try:
             result = str(filtered_json)
         except Exception as e:
-            logger.error('Error casting to str: {}', str(e))
+            self.errors.error('Error casting to str: {}', str(e))
             return
 
+        self.updated = monotonic()
         if result in self.healthy:
             self.value = HealthState.Healthy
             return
@@ -0,0 +1,200 @@
+from array import array
+from json import dumps
+
+from .clock import time
+
+
+SERIES = ('sensor', 'vmax', 'vmin')
+TIERS = ('raw', '1m', '15m')
+
+
+# Rings start small and double up to their capacity, so a series that rarely changes stays small
+def grow(arrays, capacity):
+    n = len(arrays[0])
+    extra = min(capacity, max(8, 2 * n)) - n
+    for a in arrays:
+        a.frombytes(bytes(a.itemsize * extra))
+
+
+class Raw(object):
+    __slots__ = ('window', 'capacity', 'times', 'values', 'head', 'size')
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.capacity = capacity
+        self.times = array('d')
+        self.values = array('d')
+        self.head = 0
+        self.size = 0
+
+    def add(self, value, now):
+        if self.head == len(self.times):
+            grow((self.times, self.values), self.capacity)
+        self.times[self.head] = now
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def rows(self, since, now):
+        cutoff = now - self.window if since is None else max(since, now - self.window)
+        # Size is read before head, the reverse of the order add publishes them, so only filled slots are read
+        size = self.size
+        head = self.head
+        n = len(self.times)
+        for j in range(size):
+            i = (head - size + j) % n
+            if self.times[i] >= cutoff:
+                yield [self.times[i], self.values[i]]
+
+
+# Fixed-width buckets aligned to the epoch, so every zone's buckets line up
+class Tier(object):
+    __slots__ = ('width', 'capacity', 'keys', 'minimum', 'maximum', 'total', 'count', 'head', 'size')
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.keys = array('q')
+        self.minimum = array('d')
+        self.maximum = array('d')
+        self.total = array('d')
+        self.count = array('q')
+        self.head = 0
+        self.size = 0
+
+    def add(self, value, now):
+        key = int(now // self.width)
+        i = self.head
+        if self.size and self.keys[i] == key:
+            if value < self.minimum[i]:
+                self.minimum[i] = value
+            if value > self.maximum[i]:
+                self.maximum[i] = value
+            self.total[i] += value
+            self.count[i] += 1
+            return
+        if self.size:
+            i = (i + 1) % self.capacity
+        if i == len(self.keys):
+            grow((self.keys, self.minimum, self.maximum, self.total, self.count), self.capacity)
+        # The metrics thread reads rows while we write, so a bucket is filled before head and size reach it
+        self.keys[i] = key
+        self.minimum[i] = self.maximum[i] = self.total[i] = value
+        self.count[i] = 1
+        self.head = i
+        self.size = min(self.size + 1, self.capacity)
+
+    def rows(self, since, now):
+        size = self.size
+        head = self.head
+        n = len(self.keys)
+        for j in range(size):
+            i = (head - size + 1 + j) % n
+            start = self.keys[i] * self.width
+            if since is not None and start + self.width <= since:
+                continue
+            yield [start, self.minimum[i], self.total[i] / self.count[i], self.maximum[i], self.count[i]]
+
+
+class History(object):
+    __slots__ = ('raw', 'tiers')
+
+    def __init__(
+            self,
+            raw_window=3600.0,
+            raw_capacity=720,
+            minutes=1440,
+            quarters=672):
+        self.raw = Raw(raw_window, raw_capacity)
+        self.tiers = {
+            '1m': Tier(60, minutes),
+            '15m': Tier(900, quarters),
+        }
+
+    def record(self, value, now=None):
+        now = time() if now is None else now
+        self.raw.add(value, now)
+        for tier in self.tiers.values():
+            tier.add(value, now)
+
+    def query(self, tier='raw', since=None, now=None):
+        now = time() if now is None else now
+        if tier == 'raw':
+            return {'columns': ['time', 'value'], 'rows': list(self.raw.rows(since, now))}
+        return {'columns': ['time', 'min', 'mean', 'max', 'count'], 'rows': list(self.tiers[tier].rows(since, now))}
+
+
+class HistoryPolicy(object):
+    def __init__(
+            self,
+            *args,
+            raw_window=3600.0,
+            raw_capacity=720,
+            minutes=1440,
+            quarters=672,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.raw_window = raw_window
+        self.raw_capacity = raw_capacity
+        self.minutes = minutes
+        self.quarters = quarters
+
+    def attach(self, controller):
+        for series in SERIES:
+            component = getattr(controller, series)
+            if component.history is None:
+                component.history = History(self.raw_window, self.raw_capacity, self.minutes, self.quarters)
+
+
+# A negative since counts back from now, so a dashboard can ask for the last few minutes
+def query(controllers, zone=None, series='sensor', tier='raw', since=None):
+    if series not in SERIES:
+        raise ValueError(f'Unknown series {series}, expected one of {", ".join(SERIES)}')
+    if tier not in TIERS:
+        raise ValueError(f'Unknown tier {tier}, expected one of {", ".join(TIERS)}')
+    now = time()
+    if since is not None:
+        since = float(since)
+        if since < 0:
+            since += now
+
+    zones = {}
+    for controller in controllers:
+        if zone is not None and controller.name != zone:
+            continue
+        history = getattr(controller, series).history
+        if history is None:
+            raise ValueError(f'History is not enabled for {controller.name}')
+        zones[controller.name] = history.query(tier, since, now)
+    if zone is not None and not zones:
+        raise ValueError(f'Unknown zone {zone}')
+    return {'series': series, 'tier': tier, 'zones': zones}
+
+
+class HistoryRequests(object):
+    __slots__ = ('topic', 'response_topic', 'controllers', 'owner')
+
+    def __init__(self, topic, response_topic, controllers, owner):
+        self.topic = topic
+        self.response_topic = response_topic
+        self.controllers = controllers
+        self.owner = owner
+
+    def dispatch(self, payload):
+        request = payload.get('payload')
+        if not isinstance(request, dict):
+            request = {'zone': request} if request else {}
+        try:
+            response = query(self.controllers, **{
+                k: request[k]
+                for k in ('zone', 'series', 'tier', 'since')
+                if k in request
+            })
+        except (TypeError, ValueError) as e:
+            response = {'error': str(e)}
+        if 'id' in request:
+            response['id'] = request['id']
+        self.owner.client.publish(self.response_topic, dumps(response), qos=0, retain=False)
+        return ()
@@ -0,0 +1,127 @@
+from functools import cached_property, partial
+
+from loguru import logger
+
+from .batch import BatchEngine
+from .conflation import ConflationQueue
+from .dispatcher import Dispatcher
+from .history import HistoryRequests
+from .loop import loop_async, loop_forever
+from .session import SessionPolicy
+
+
+class Hub(object):
+    def __init__(
+            self,
+            server,
+            port,
+            controllers,
+            *args,
+            name=None,
+            lwt_topic=None,
+            client=None,
+            recorder=None,
+            store=None,
+            batch=False,
+            conflate=0,
+            session=None,
+            history=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+
+        self.server = server
+        self.port = port
+
+        self.controllers = controllers
+
+        self.name = name or __package__
+        self.lwt_topic = lwt_topic or f'tele/{self.name}/LWT'.replace('.', '_')
+
+        self.session = session or SessionPolicy()
+        self.session.identify(self.name)
+        if client is not None:
+            self.client = client
+        for controller in self.controllers:
+            controller.client = self.client
+        self.dispatcher = Dispatcher(
+            self.controllers,
+            recorder=recorder,
+            store=store,
+            batch=BatchEngine() if batch else None,
+            history=history)
+        requests = []
+        if history is not None:
+            topic = f'{self.name}/history'.replace('.', '_')
+            self.dispatcher.bind('history', f'cmnd/{topic}', HistoryRequests(f'cmnd/{topic}', f'stat/{topic}', self.controllers, self))
+            requests.append(f'cmnd/{topic}')
+        self.queue = ConflationQueue(conflate, passthrough=requests) if conflate else None
+
+    @property
+    def topics(self):
+        return self.dispatcher.topics
+
+    @cached_property
+    def client(self):
+        c = self.session.client(self.name)
+        c.on_connect = self.on_connect
+        c.on_message = self.on_message
+        c.will_set(self.lwt_topic, 'Offline', qos=0, retain=False)
+        return c
+
+    def connect(self):
+        return self.session.connect(self.client, self.server, self.port)
+
+    def loop_forever(self):
+        loop_forever(self.client, self.tick, drain=self.drain if self.queue is not None else None, session=self.session)
+
+    async def loop_async(self):
+        await loop_async(self.client, self.connect, self.tick, drain=self.drain if self.queue is not None else None, session=self.session)
+
+    def drain(self):
+        return self.queue.drain(partial(self.dispatcher.on_message, self.client, None))
+
+    def tick(self, now=None):
+        self.dispatcher.tick(now)
+
+    def on_connect(self, client, userdata, flags, rc):
+        logger.info('Connected with result code {}, hosting {} zones', rc, len(self.controllers))
+        if rc == 0:
+            self.session.reset()
+        self.client.publish(self.lwt_topic, 'Online', qos=0, retain=False)
+        for controller in self.controllers:
+            controller.republish()
+        self.session.subscribe(self.client, self.dispatcher.topic_qos, flags)
+
+    def update(self, added=(), removed=()):
+        before = set(self.topics)
+        for controller in removed:
+            self.dispatcher.remove(controller)
+            self.controllers.remove(controller)
+            self.client.publish(controller.lwt_topic, 'Offline', qos=controller.policy.qos, retain=controller.policy.retain)
+        for controller in added:
+            controller.client = self.client
+            self.controllers.append(controller)
+            self.dispatcher.add(controller)
+        after = set(self.topics)
+
+        for topic in before - after:
+            self.client.unsubscribe(topic)
+        # Subscribing again to a shared topic makes the broker resend its retained message for the new zone
+        subscribe = after - before
+        subscribe.update(topic for controller in added for topic in controller.topics)
+        self.session.subscribe(self.client, {
+            topic: qos
+            for topic, qos in self.dispatcher.topic_qos.items()
+            if topic in subscribe
+        })
+        for controller in added:
+            controller.republish()
+        logger.info('Hosting {} zones, {} added, {} removed, {} topics subscribed, {} unsubscribed', len(self.controllers), len(added), len(removed), len(subscribe), len(before - after))
+
+    def on_message(self, client, userdata, msg):
+        if self.queue is not None:
+            self.queue.put(msg)
+            return
+        self.dispatcher.on_message(client, userdata, msg)
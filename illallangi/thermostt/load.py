@@ -1,12 +1,14 @@
-from jmespath import compile
-from jmespath.parser import ParsedResult
-
-from loguru import logger
+from time import perf_counter
 
+from . import metrics
+from .clock import monotonic
+from .component import Component
 from .loadstate import LoadState
 
 
-class Load(object):
+class Load(Component):
+    __slots__ = ('q0', 'q0_topic', 'q0_value', 'q1', 'q1_topic', 'q1_value', 'qe', 'qe_topic', 'qe_value')
+
     def __init__(
             self,
             name,
@@ -25,8 +27,9 @@ class Load(object):
             **kwargs):
         super().__init__(
             *args,
+            topic=topic or f'tele/{name}/STATE',
+            jmespath=jmespath or 'payload.POWER',
             **kwargs)
-        self.topic = topic or f'tele/{name}/STATE'
 
         self.q0 = q0 or ['OFF']
         self.q0_topic = q0_topic or f'cmnd/{name}/POWER'
@@ -40,10 +43,6 @@ class Load(object):
         self.qe_topic = qe_topic or f'cmnd/{name}/POWER'
         self.qe_value = qe_value or self.qe[0]
 
-        self.jmespath = jmespath or 'payload.POWER'
-        self.jmespath = compile(self.jmespath) if not isinstance(self.jmespath, ParsedResult) else self.jmespath
-        logger.debug('Subscribed to {} with jmespath filter {}', self.topic, self.jmespath)
-
     def __eq__(self, other):
         if isinstance(other, LoadState):
             if other is LoadState.Q0 and self.value in self.q0:
@@ -55,33 +54,29 @@ class Load(object):
             return False
         return super.__eq__(other)
 
-    @property
-    def value(self):
-        return self._value if '_value' in self.__dict__ else None
-
-    @value.setter
-    def value(self, value):
-        self._value = value
-
-    def __str__(self):
-        return self.value
-
     def on_message(self, payload):
+        m = metrics.registry
+        if m is not None:
+            m.count('load')
+            start = perf_counter()
         try:
             filtered_json = self.jmespath.search(payload)
         except Exception as e:
-            logger.error('Error filtering: {}', str(e))
+            self.errors.error('Error filtering: {}', str(e))
             return
+        if m is not None:
+            m.observe('filter', perf_counter() - start)
 
         try:
             result = str(filtered_json)
         except Exception as e:
-            logger.error('Error casting to str: {}', str(e))
+            self.errors.error('Error casting to str: {}', str(e))
             return
 
         if result in self.q0 or result in self.q1 or result in self.qe:
+            self.updated = monotonic()
             self.value = result
             return
 
-        logger.error('Unhandled value {}', result)
+        self.errors.error('Unhandled value {}', result)
         pass
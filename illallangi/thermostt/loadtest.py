@@ -0,0 +1,251 @@
+from collections import deque
+from json import dumps
+from multiprocessing import get_context
+from os import sysconf
+from resource import RUSAGE_SELF, getrusage
+from time import perf_counter, process_time
+
+from loguru import logger
+
+from .config import controller
+from .hub import Hub
+from .topictrie import TopicTrie
+
+
+class BrokerMessage(object):
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class Broker(object):
+    def __init__(
+            self,
+            *args,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.subscriptions = TopicTrie()
+        self.queue = deque()
+        self.routed = 0
+        self.delivered = 0
+
+    def pump(self):
+        while self.queue:
+            topic, payload = self.queue.popleft()
+            self.routed += 1
+            msg = BrokerMessage(topic, payload)
+            for client in self.subscriptions.match(topic):
+                self.delivered += 1
+                client.on_message(client, None, msg)
+
+
+class BrokerClient(object):
+    def __init__(
+            self,
+            broker,
+            *args,
+            on_message=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.broker = broker
+        self.on_message = on_message
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if not isinstance(payload, bytes):
+            payload = str(payload).encode('UTF-8')
+        self.broker.queue.append((topic, payload))
+
+    # Accepts paho's forms, a topic string or a list of (topic, qos) pairs
+    def subscribe(self, topic, qos=0):
+        for t in ([topic] if isinstance(topic, str) else [t for t, _ in topic]):
+            self.broker.subscriptions.add(t, self)
+
+
+class Plant(object):
+    def __init__(
+            self,
+            broker,
+            name,
+            sensor,
+            *args,
+            temperature=18.0,
+            ambient=15.0,
+            heating=0.05,
+            loss=0.002,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.name = name
+        self.sensor = sensor
+        self.temperature = temperature
+        self.ambient = ambient
+        self.heating = heating
+        self.loss = loss
+        self.power = 'OFF'
+        self.switches = 0
+        self.commands = 0
+        self.reading = None
+        self.latencies = []
+        self.client = BrokerClient(broker, on_message=self.on_message)
+        self.client.subscribe(f'cmnd/{self.name}/POWER')
+
+    def step(self, dt):
+        heating = self.heating if self.power == 'ON' else 0.0
+        self.temperature += (heating - self.loss * (self.temperature - self.ambient)) * dt
+
+    def state(self):
+        self.client.publish(f'tele/{self.name}/STATE', dumps({'POWER': self.power}))
+
+    def on_message(self, client, userdata, msg):
+        self.commands += 1
+        power = msg.payload.decode('UTF-8')
+        if power != self.power:
+            self.power = power
+            self.switches += 1
+            if self.reading is not None:
+                self.latencies.append(perf_counter() - self.reading)
+        self.state()
+
+
+class SensorHub(object):
+    def __init__(
+            self,
+            broker,
+            name,
+            plants,
+            *args,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.name = name
+        self.plants = plants
+        self.client = BrokerClient(broker)
+
+    def publish(self):
+        now = perf_counter()
+        payload = {'Time': '2020-09-12T10:15:42'}
+        for i, plant in enumerate(self.plants, 1):
+            payload[f'DS18B20-{i}'] = {'Id': plant.sensor, 'Temperature': round(plant.temperature, 1)}
+            plant.reading = now
+        payload['TempUnit'] = 'C'
+        self.client.publish(f'tele/{self.name}/SENSOR', dumps(payload))
+
+
+def rss():
+    try:
+        with open('/proc/self/statm', 'r') as fh:
+            return int(fh.read().split()[1]) * sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return getrusage(RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+
+def simulate(zones, duration=600.0, step=1.0, teleperiod=10.0, shared=True, per_hub=8):
+    logger.disable(__package__)
+
+    baseline = rss()
+    broker = Broker()
+
+    plants = [
+        Plant(broker, f'tasmota_load_{i}', f'28FF{i:08X}', temperature=18.0 + (i % 7) / 2)
+        for i in range(zones)
+    ]
+    hubs = [
+        SensorHub(broker, f'tasmota_sensors_{i // per_hub}', plants[i:i + per_hub])
+        for i in range(0, zones, per_hub)
+    ]
+
+    controllers = [
+        controller(
+            'localhost',
+            1883,
+            name=f'zone_{i}',
+            load=plant.name,
+            q0='ON',
+            q1='OFF',
+            sensor=plant.sensor,
+            sensor_health=f'tasmota_sensors_{i // per_hub}')
+        for i, plant in enumerate(plants)
+    ]
+
+    if shared:
+        client = BrokerClient(broker)
+        hub = Hub('localhost', 1883, controllers, client=client)
+        client.on_message = hub.on_message
+        hub.on_connect(client, None, None, 0)
+        tick = hub.tick
+    else:
+        for c in controllers:
+            c.client = BrokerClient(broker, on_message=c.on_message)
+            c.on_connect(c.client, None, None, 0)
+
+        def tick():
+            for c in controllers:
+                c.tick()
+
+    setup = BrokerClient(broker)
+    for i, plant in enumerate(plants):
+        setup.publish(f'cmnd/zone_{i}/vmax', '21')
+        setup.publish(f'cmnd/zone_{i}/vmin', '20')
+        setup.publish(f'tele/{plant.name}/LWT', 'Online')
+        plant.state()
+    for sensors in hubs:
+        setup.publish(f'tele/{sensors.name}/LWT', 'Online')
+    broker.pump()
+
+    routed = broker.routed
+    wall = perf_counter()
+    cpu = process_time()
+    elapsed = 0.0
+    next_teleperiod = 0.0
+    while elapsed < duration:
+        for plant in plants:
+            plant.step(step)
+        if elapsed >= next_teleperiod:
+            for sensors in hubs:
+                sensors.publish()
+            next_teleperiod += teleperiod
+        broker.pump()
+        tick()
+        broker.pump()
+        elapsed += step
+    wall = perf_counter() - wall
+    cpu = process_time() - cpu
+
+    latencies = [latency for plant in plants for latency in plant.latencies]
+    return {
+        'zones': zones,
+        'shared': shared,
+        'simulated': duration,
+        'wall': wall,
+        'cpu': cpu,
+        'messages': broker.routed - routed,
+        'rate': (broker.routed - routed) / wall if wall else 0.0,
+        'commands': sum(plant.commands for plant in plants),
+        'switches': sum(plant.switches for plant in plants),
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'rss': rss(),
+        'zone_rss': (rss() - baseline) / zones,
+    }
+
+
+def loadtest(zones, **kwargs):
+    context = get_context('spawn')
+    for n in zones:
+        with context.Pool(1) as pool:
+            yield pool.apply(simulate, (n,), kwargs)
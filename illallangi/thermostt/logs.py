@@ -0,0 +1,55 @@
+from loguru import logger
+
+from .clock import monotonic
+
+
+tracing = False
+interval = 60.0
+pending = {}
+
+
+def enable(log_level, repeat_interval=60.0):
+    global tracing, interval
+    tracing = logger.level(log_level.upper()).no <= logger.level('TRACE').no
+    interval = repeat_interval
+
+
+def tick(now=None):
+    if not pending:
+        return
+    now = monotonic() if now is None else now
+    for repeats in [r for r in pending.values() if now >= r.deadline]:
+        repeats.flush(now)
+
+
+# Identical errors from one component are logged once, then summarised every interval
+class Repeats(object):
+    __slots__ = ('message', 'count', 'deadline')
+
+    def __init__(self):
+        self.message = None
+        self.count = 0
+        self.deadline = 0.0
+
+    def error(self, message, *args):
+        if not interval:
+            logger.opt(depth=1).error(message, *args)
+            return
+        text = message.format(*args)
+        now = monotonic()
+        if text == self.message and now < self.deadline:
+            if not self.count:
+                pending[id(self)] = self
+            self.count += 1
+            return
+        self.flush(now)
+        self.message = text
+        self.deadline = now + interval
+        logger.opt(depth=1).error('{}', text)
+
+    def flush(self, now):
+        pending.pop(id(self), None)
+        if self.count:
+            logger.error('{} (repeated {} times)', self.message, self.count)
+        self.count = 0
+        self.deadline = now + interval
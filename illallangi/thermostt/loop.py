@@ -0,0 +1,138 @@
+from asyncio import get_running_loop, run as asyncio_run, sleep as async_sleep
+from select import select
+from time import monotonic, sleep
+
+from loguru import logger
+
+from paho.mqtt.client import MQTT_ERR_SUCCESS
+
+
+def readable(client):
+    sock = client.socket()
+    if sock is None:
+        return False
+    if hasattr(sock, 'pending') and sock.pending():
+        return True
+    return bool(select([sock], [], [], 0)[0])
+
+
+# Keep reading while data is waiting, so a drain sees the whole burst
+def burst(client, read, limit=1000):
+    rc = MQTT_ERR_SUCCESS
+    for _ in range(limit):
+        if not readable(client):
+            break
+        rc = read()
+        if rc != MQTT_ERR_SUCCESS:
+            break
+    return rc
+
+
+def loop_forever(client, tick, interval=1.0, drain=None, session=None):
+    deadline = monotonic()
+    retry = None
+    while True:
+        if retry is None:
+            rc = client.loop(timeout=interval)
+            if drain is not None:
+                if rc == MQTT_ERR_SUCCESS:
+                    rc = burst(client, lambda: client.loop(timeout=0))
+                drain()
+            if rc != MQTT_ERR_SUCCESS:
+                delay = session.backoff() if session is not None else interval
+                logger.warning('Connection lost with result code {}, reconnecting in {:.1f}s', rc, delay)
+                retry = monotonic() + delay
+        # Keep ticking while waiting, so timers still fire during an outage
+        elif monotonic() < retry:
+            sleep(min(interval, retry - monotonic()))
+        else:
+            retry = None
+            try:
+                client.reconnect()
+            except OSError as e:
+                delay = session.backoff() if session is not None else interval
+                logger.error('Error reconnecting, retrying in {:.1f}s: {}', delay, str(e))
+                retry = monotonic() + delay
+
+        now = monotonic()
+        if now >= deadline:
+            tick(now)
+            deadline = now + interval
+
+
+class AsyncioHelper(object):
+    def __init__(
+            self,
+            loop,
+            client,
+            *args,
+            interval=1.0,
+            drain=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.loop = loop
+        self.client = client
+        self.interval = interval
+        self.drain = drain
+        self.misc = None
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read if self.drain is None else self.read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def read(self):
+        if self.client.loop_read() == MQTT_ERR_SUCCESS:
+            burst(self.client, self.client.loop_read)
+        self.drain()
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc is not None:
+            self.misc.cancel()
+            self.misc = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        while self.client.loop_misc() == MQTT_ERR_SUCCESS:
+            await async_sleep(self.interval)
+
+
+def start(c, runtime):
+    if runtime == 'asyncio':
+        asyncio_run(c.loop_async())
+        return
+    c.connect()
+    c.loop_forever()
+
+
+async def loop_async(client, connect, tick, interval=1.0, drain=None, session=None):
+    AsyncioHelper(get_running_loop(), client, interval=interval, drain=drain)
+    connect()
+    retry = None
+    while True:
+        await async_sleep(interval)
+        now = monotonic()
+        if client.is_connected():
+            retry = None
+        elif retry is None:
+            delay = session.backoff() if session is not None else 0.0
+            logger.warning('Connection lost, reconnecting in {:.1f}s', delay)
+            retry = now + delay
+        if retry is not None and now >= retry:
+            retry = now + (session.backoff() if session is not None else 0.0)
+            try:
+                client.reconnect()
+            except OSError as e:
+                logger.error('Error reconnecting, retrying in {:.1f}s: {}', retry - now, str(e))
+        tick(now)
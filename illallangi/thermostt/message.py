@@ -0,0 +1,49 @@
+from functools import cached_property
+
+from . import codec
+from .logs import Repeats
+
+
+# Decoding errors are not tied to a component, so they share one suppressor
+errors = Repeats()
+
+
+class Message(object):
+    def __init__(
+            self,
+            topic,
+            payload,
+            *args,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.topic = topic
+        self.payload = payload
+
+    @classmethod
+    def wrap(cls, msg):
+        if isinstance(msg, cls):
+            return msg
+        return cls(msg.topic, msg.payload)
+
+    @cached_property
+    def decoded(self):
+        try:
+            return self.payload.decode('UTF-8')
+        except Exception as e:
+            errors.error('Error decoding payload: {}', str(e))
+            return None
+
+    @cached_property
+    def document(self):
+        if self.decoded is None:
+            return None
+
+        try:
+            return {'payload': codec.loads(self.decoded)}
+        except ValueError:
+            return {'payload': self.decoded}
+        except Exception as e:
+            errors.error('Error decoding json: {}', str(e))
+            return None
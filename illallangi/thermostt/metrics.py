@@ -0,0 +1,147 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Thread
+from time import monotonic
+from urllib.parse import parse_qs
+
+from .history import query
+
+
+registry = None
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram(object):
+    __slots__ = ('bounds', 'buckets', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(object):
+    bounds = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 0.1, 1.0)
+
+    def __init__(
+            self,
+            controllers,
+            *args,
+            queue=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.controllers = controllers
+        self.queue = queue
+        # Pre-create every series so the HTTP thread never sees a dict resize
+        self.messages = dict.fromkeys(('load', 'sensor', 'vmax', 'vmin', 'health', 'unmatched'), 0)
+        self.switches = dict.fromkeys(('Q0', 'Q1', 'Qe'), 0)
+        self.stages = {
+            stage: Histogram(self.bounds)
+            for stage in ('decode', 'filter', 'decision', 'publish')
+        }
+
+    def count(self, topic_class):
+        self.messages[topic_class] = self.messages.get(topic_class, 0) + 1
+
+    def switch(self, state):
+        self.switches[state] = self.switches.get(state, 0) + 1
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def render(self):
+        now = monotonic()
+        lines = [
+            '# HELP thermostt_messages_total Messages dispatched, by topic class.',
+            '# TYPE thermostt_messages_total counter',
+            *(f'thermostt_messages_total{{class="{escape(k)}"}} {v}' for k, v in sorted(self.messages.items())),
+            '# HELP thermostt_switches_total Load switch commands, by target state.',
+            '# TYPE thermostt_switches_total counter',
+            *(f'thermostt_switches_total{{state="{escape(k)}"}} {v}' for k, v in sorted(self.switches.items())),
+            '# HELP thermostt_stage_seconds Time spent in each stage of the message pipeline.',
+            '# TYPE thermostt_stage_seconds histogram',
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, bucket in zip((*self.bounds, '+Inf'), histogram.buckets):
+                cumulative += bucket
+                lines.append(f'thermostt_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'thermostt_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'thermostt_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines.extend([
+            '# HELP thermostt_healthy Whether the zone has every value it needs and all health checks pass.',
+            '# TYPE thermostt_healthy gauge',
+            *(f'thermostt_healthy{{zone="{escape(c.name)}"}} {int(c.healthy)}' for c in self.controllers),
+            '# HELP thermostt_sensor_age_seconds Seconds since the zone last received a sensor reading.',
+            '# TYPE thermostt_sensor_age_seconds gauge',
+            *(f'thermostt_sensor_age_seconds{{zone="{escape(c.name)}"}} {now - c.sensor.updated:.3f}' for c in self.controllers if c.sensor.updated is not None),
+        ])
+        if self.queue is not None:
+            lines.extend([
+                '# HELP thermostt_conflation_total Messages through the conflation queue, by outcome.',
+                '# TYPE thermostt_conflation_total counter',
+                *(f'thermostt_conflation_total{{outcome="{k}"}} {getattr(self.queue, k)}' for k in ('received', 'superseded', 'dropped', 'drained')),
+                '# HELP thermostt_conflation_pending Topics waiting in the conflation queue.',
+                '# TYPE thermostt_conflation_pending gauge',
+                f'thermostt_conflation_pending {len(self.queue)}',
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path, _, params = self.path.partition('?')
+        if path == '/history':
+            self.history(params)
+            return
+        if path != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode('UTF-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def history(self, params):
+        try:
+            result = query(self.server.metrics.controllers, **{
+                k: v[-1]
+                for k, v in parse_qs(params).items()
+                if k in ('zone', 'series', 'tier', 'since')
+            })
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        body = dumps(result).encode('UTF-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def enable(controllers, port=None, host='0.0.0.0', queue=None):
+    global registry
+    registry = Metrics(controllers, queue=queue)
+    if port:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.metrics = registry
+        Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return registry
@@ -0,0 +1,135 @@
+from atexit import register
+from queue import Empty, Full, Queue
+from sys import stderr
+from threading import Thread
+from time import monotonic, sleep
+
+from loguru import logger
+
+from notifiers import get_notifier
+
+from . import logs
+
+
+class QueuedNotifier(object):
+    def __init__(
+            self,
+            notifier,
+            *args,
+            defaults=None,
+            maxsize=100,
+            batch_size=20,
+            batch_interval=2.0,
+            retries=3,
+            retry_delay=1.0,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.notifier = notifier
+        self.defaults = defaults or {}
+        self.queue = Queue(maxsize)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.thread = Thread(target=self.run, name='notifier', daemon=True)
+        self.thread.start()
+        register(self.close)
+
+    def __call__(self, message):
+        try:
+            self.queue.put_nowait(str(message).rstrip('\n'))
+        except Full:
+            self.dropped += 1
+
+    def batch(self):
+        messages = [self.queue.get()]
+        if messages[0] is None:
+            return None
+        deadline = monotonic() + self.batch_interval
+        while len(messages) < self.batch_size:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = self.queue.get(timeout=remaining)
+            except Empty:
+                break
+            if message is None:
+                self.queue.put_nowait(None)
+                break
+            messages.append(message)
+        return messages
+
+    def coalesce(self, messages):
+        counts = {}
+        for message in messages:
+            counts[message] = counts.get(message, 0) + 1
+        lines = [
+            message if count == 1 else f'{message} (x{count})'
+            for message, count in counts.items()
+        ]
+        dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.append(f'{dropped} notifications dropped while the notifier was busy')
+        return '\n'.join(lines)
+
+    def run(self):
+        while True:
+            messages = self.batch()
+            if messages is None:
+                return
+            self.send(self.coalesce(messages))
+
+    # Later messages wait in the bounded queue while a batch is retried, so order is kept and overflow is counted
+    def send(self, message):
+        for attempt in range(1, self.retries + 2):
+            try:
+                self.notifier.notify(message=message, **self.defaults).raise_on_errors()
+                self.sent += 1
+                return True
+            except Exception as e:
+                # Logged below SUCCESS so the failure is not fed back into this sink
+                logger.warning('Error sending notification, attempt {} of {}: {}', attempt, self.retries + 1, str(e))
+            if attempt <= self.retries:
+                sleep(self.retry_delay * 2 ** (attempt - 1))
+        self.failed += 1
+        return False
+
+    def close(self, timeout=5.0):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Full:
+            return
+        self.thread.join(timeout)
+
+
+def configure(
+        log_level,
+        slack_webhook=None,
+        slack_username=None,
+        slack_format='{message}',
+        slack_queue_size=100,
+        slack_batch_interval=2.0,
+        log_enqueue=False,
+        log_repeat_interval=60.0):
+    logger.remove()
+    # An enqueued sink writes from a background thread, so the hot path never blocks on stderr
+    logger.add(stderr, level=log_level, enqueue=log_enqueue)
+    logs.enable(log_level, log_repeat_interval)
+
+    if slack_webhook:
+        params = {
+            "username": slack_username,
+            "webhook_url": slack_webhook
+        }
+        slack = QueuedNotifier(
+            get_notifier("slack"),
+            defaults=params,
+            maxsize=slack_queue_size,
+            batch_interval=slack_batch_interval)
+        logger.add(slack, format=slack_format, level="SUCCESS")
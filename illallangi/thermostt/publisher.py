@@ -0,0 +1,85 @@
+from .clock import monotonic
+
+
+class PublishPolicy(object):
+    def __init__(
+            self,
+            *args,
+            heartbeat=60.0,
+            interval=0.0,
+            retain=False,
+            qos=0,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.heartbeat = heartbeat
+        self.interval = interval or 0.0
+        self.retain = retain
+        self.qos = qos
+
+
+class Publisher(object):
+    __slots__ = ('topic', 'policy', 'format', 'value', 'pending', 'published', 'timer')
+
+    def __init__(
+            self,
+            topic,
+            policy,
+            format=str):
+        self.topic = topic
+        self.policy = policy
+        self.format = format
+        self.timer = None
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.pending = False
+        self.published = None
+        self.arm()
+
+    def deadline(self):
+        if self.published is None:
+            return None
+        if self.pending:
+            return self.published + self.policy.interval
+        if self.policy.heartbeat:
+            return self.published + self.policy.heartbeat
+        return None
+
+    def arm(self):
+        if self.timer is not None:
+            self.timer.rearm(self.deadline())
+
+    def send(self, client, value, now):
+        client.publish(self.topic, self.format(value), qos=self.policy.qos, retain=self.policy.retain)
+        self.value = value
+        self.pending = False
+        self.published = now
+        self.arm()
+
+    def publish(self, client, value, now=None):
+        now = monotonic() if now is None else now
+        if self.published is not None and value == self.value and not self.pending:
+            return False
+        if self.published is not None and now - self.published < self.policy.interval:
+            self.value = value
+            self.pending = True
+            self.arm()
+            return False
+        self.send(client, value, now)
+        return True
+
+    def tick(self, client, now=None):
+        if self.published is None:
+            return False
+        now = monotonic() if now is None else now
+        if self.pending and now - self.published >= self.policy.interval:
+            self.send(client, self.value, now)
+            return True
+        if self.policy.heartbeat and now - self.published >= self.policy.heartbeat:
+            self.send(client, self.value, now)
+            return True
+        self.arm()
+        return False
@@ -0,0 +1,125 @@
+from mmap import mmap
+from os import O_CREAT, O_RDWR, close, fstat, ftruncate, open as os_open
+from struct import Struct
+from time import time
+
+
+MAGIC = b'THERMREC'
+HEADER = Struct('<8sQQQQQ')
+RECORD = Struct('<IdQHIH')
+LENGTH = Struct('<I')
+
+
+def decision(controllers):
+    return ';'.join(f'{c.name}={c.target}' for c in controllers)
+
+
+class Recorder(object):
+    def __init__(
+            self,
+            path,
+            *args,
+            size=16 * 2 ** 20,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.path = path
+        fd = os_open(path, O_RDWR | O_CREAT, 0o644)
+        try:
+            if fstat(fd).st_size == 0:
+                ftruncate(fd, HEADER.size + size)
+            self.map = mmap(fd, 0)
+        finally:
+            close(fd)
+
+        magic, capacity, head, tail, count, sequence = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            capacity, head, tail, count, sequence = len(self.map) - HEADER.size, 0, 0, 0, 0
+        self.capacity = capacity
+        self.head = head
+        self.tail = tail
+        self.count = count
+        self.sequence = sequence
+        self.flush_header()
+
+    def flush_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, self.capacity, self.head, self.tail, self.count, self.sequence)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+
+    def length(self, position):
+        return LENGTH.unpack_from(self.map, HEADER.size + position)[0]
+
+    def next(self, position):
+        position += self.length(position)
+        if position + LENGTH.size > self.capacity or self.length(position) == 0:
+            return 0
+        return position
+
+    def pop(self):
+        self.tail = self.next(self.tail)
+        self.count -= 1
+
+    def record(self, topic, payload, decision='', timestamp=None):
+        topic = topic.encode('UTF-8')[:0xffff]
+        decision = decision.encode('UTF-8')[:0xffff]
+        room = self.capacity - RECORD.size - len(topic) - len(decision)
+        if room <= 0:
+            return False
+        payload = payload[:room]
+        length = RECORD.size + len(topic) + len(payload) + len(decision)
+
+        if self.head + length > self.capacity:
+            while self.count and self.tail >= self.head:
+                self.pop()
+            if self.head + LENGTH.size <= self.capacity:
+                LENGTH.pack_into(self.map, HEADER.size + self.head, 0)
+            self.head = 0
+        while self.count and self.head <= self.tail < self.head + length:
+            self.pop()
+
+        position = HEADER.size + self.head
+        RECORD.pack_into(
+            self.map,
+            position,
+            length,
+            time() if timestamp is None else timestamp,
+            self.sequence,
+            len(topic),
+            len(payload),
+            len(decision))
+        position += RECORD.size
+        self.map[position:position + len(topic)] = topic
+        position += len(topic)
+        self.map[position:position + len(payload)] = payload
+        position += len(payload)
+        self.map[position:position + len(decision)] = decision
+
+        if not self.count:
+            self.tail = self.head
+        self.head += length
+        self.count += 1
+        self.sequence += 1
+        self.flush_header()
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        position = self.tail
+        for _ in range(self.count):
+            offset = HEADER.size + position
+            length, timestamp, sequence, topic, payload, decision = RECORD.unpack_from(self.map, offset)
+            offset += RECORD.size
+            yield (
+                timestamp,
+                sequence,
+                bytes(self.map[offset:offset + topic]).decode('UTF-8'),
+                bytes(self.map[offset + topic:offset + topic + payload]),
+                bytes(self.map[offset + topic + payload:offset + topic + payload + decision]).decode('UTF-8'),
+            )
+            position = self.next(position)
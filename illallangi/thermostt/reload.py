@@ -0,0 +1,107 @@
+import signal
+from os import stat
+from time import monotonic
+
+from loguru import logger
+
+from .config import controller, load_config
+from .timerwheel import Timer
+
+
+class Reloader(object):
+    def __init__(
+            self,
+            path,
+            hub,
+            zones,
+            *args,
+            store=None,
+            watch=False,
+            interval=1.0,
+            select=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.path = path
+        self.hub = hub
+        self.store = store
+        self.watch = watch
+        self.interval = interval
+        self.select = select
+        self.zones = {
+            z.get('name'): (z, c)
+            for z, c in zip(zones, hub.controllers)
+        }
+        self.requested = False
+        self.modified = self.mtime()
+        self.timer = Timer(self.check)
+        self.timer.rearm(monotonic() + self.interval)
+
+    def mtime(self):
+        try:
+            return stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def install(self):
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.request)
+        self.hub.dispatcher.wheel.add(self.timer)
+        return self
+
+    # Runs as a signal handler, so only flag the reload for the next tick
+    def request(self, signum=None, frame=None):
+        self.requested = True
+
+    def check(self, now):
+        self.timer.rearm(now + self.interval)
+        if self.watch:
+            modified = self.mtime()
+            if modified != self.modified:
+                self.modified = modified
+                self.requested = True
+        if self.requested:
+            self.requested = False
+            self.reload()
+
+    def reload(self):
+        logger.info('Reloading {}', self.path)
+        try:
+            config = load_config(self.path)
+            zones = {
+                z.get('name'): z
+                for z in config['zones']
+                if self.select is None or self.select(z)
+            }
+            added = {
+                name: controller(self.hub.server, self.hub.port, **z)
+                for name, z in zones.items()
+                if name not in self.zones or self.zones[name][0] != z
+            }
+        except Exception as e:
+            logger.error('Error reloading, keeping the running configuration: {}', str(e))
+            return False
+
+        removed = {
+            name: c
+            for name, (z, c) in self.zones.items()
+            if zones.get(name) != z
+        }
+
+        for name, c in removed.items():
+            del self.zones[name]
+            if self.store is not None:
+                self.store.forget(c)
+        for name, c in added.items():
+            self.zones[name] = (zones[name], c)
+            if self.store is None:
+                continue
+            # A changed zone starts clean rather than inheriting values read under its old configuration
+            if name in removed:
+                self.store.track(c)
+            else:
+                self.store.restore([c])
+
+        self.hub.update(added=list(added.values()), removed=list(removed.values()))
+        return True
@@ -0,0 +1,31 @@
+from time import sleep
+
+from . import clock
+from .fakeclient import FakeClient
+from .hub import Hub
+from .message import Message
+from .recorder import Recorder, decision
+
+
+def replay(path, controllers, speed=0.0):
+    recorder = Recorder(path)
+    client = FakeClient()
+    hub = None
+
+    previous = None
+    try:
+        for timestamp, sequence, topic, payload, recorded in recorder:
+            if speed and previous is not None and timestamp > previous:
+                sleep((timestamp - previous) / speed)
+            previous = timestamp
+            # Expiries and retries fall due against the recorded time, however fast the replay runs
+            clock.current = timestamp
+            if hub is None:
+                hub = Hub('localhost', 1883, controllers, client=client)
+                hub.on_connect(client, None, None, 0)
+            replayed = decision(hub.dispatcher.on_message(client, None, Message(topic, payload)))
+            hub.tick(timestamp)
+            yield timestamp, sequence, topic, recorded, replayed
+    finally:
+        clock.current = None
+        recorder.close()
@@ -1,10 +1,16 @@
-from jmespath import compile
-from jmespath.parser import ParsedResult
+from sys import intern
+from time import perf_counter
 
 from loguru import logger
 
+from . import metrics
+from .clock import monotonic
+from .component import Component
+
+
+class Sensor(Component):
+    __slots__ = ('delta', 'smoothing', 'topic_class', 'history')
 
-class Sensor(object):
     def __init__(
             self,
             name,
@@ -12,40 +18,58 @@ class Sensor(object):
             topic=None,
             jmespath=None,
             delta=0.0,
+            smoothing=None,
             **kwargs):
         super().__init__(
             *args,
+            topic=topic or 'tele/+/SENSOR',
+            jmespath=jmespath or f"values(payload)[?Id=='{name}']|[0].Temperature",
             **kwargs)
-        self.topic = topic or 'tele/+/SENSOR'
-        self.jmespath = jmespath or f"values(payload)[?Id=='{name}']|[0].Temperature"
-        self.jmespath = compile(self.jmespath) if not isinstance(self.jmespath, ParsedResult) else self.jmespath
         self.delta = delta
-        logger.debug('Subscribed to {} with jmespath filter {}', self.topic, self.jmespath)
-
-    @property
-    def value(self):
-        return self._value if '_value' in self.__dict__ else None
+        self.smoothing = smoothing
+        self.history = None
+        self.topic_class = intern(type(self).__name__.lower())
+        if self.smoothing is not None:
+            logger.debug('Smoothing {} with {}', self.topic, type(self.smoothing).__name__)
 
-    @value.setter
+    @Component.value.setter
     def value(self, value):
-        self._value = value
+        Component.value.fset(self, value)
+        if self.history is not None and value is not None:
+            self.history.record(value)
 
-    def __str__(self):
-        return str(self.value)
+    def expire(self, now):
+        super().expire(now)
+        # Samples from before the gap should not pull on readings after it
+        if self.smoothing is not None:
+            self.smoothing.reset()
 
     def on_message(self, payload):
+        m = metrics.registry
+        start = perf_counter() if m is not None else None
         try:
             filtered_json = self.jmespath.search(payload)
         except Exception as e:
-            logger.error('Error filtering: {}', str(e))
+            self.errors.error('Error filtering: {}', str(e))
             return
+        if m is not None:
+            m.observe('filter', perf_counter() - start)
+        self.on_value(filtered_json)
+
+    def on_value(self, filtered_json):
+        if metrics.registry is not None:
+            metrics.registry.count(self.topic_class)
+
         if filtered_json is None:
             return
 
         try:
             result = float(filtered_json)
         except Exception as e:
-            logger.error('Error casting to float: {}', str(e))
+            self.errors.error('Error casting to float: {}', str(e))
             return
 
+        self.updated = monotonic()
+        if self.smoothing is not None:
+            result = self.smoothing.update(result, self.updated)
         self.value = result + self.delta
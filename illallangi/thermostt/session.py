@@ -0,0 +1,67 @@
+from random import random
+
+from loguru import logger
+
+from paho.mqtt.client import Client
+
+
+class SessionPolicy(object):
+    __slots__ = ('client_id', 'clean_session', 'keepalive', 'batch_size', 'reconnect', 'reconnect_cap', 'jitter', 'failures', 'subscribed')
+
+    def __init__(
+            self,
+            client_id=None,
+            clean_session=True,
+            keepalive=60,
+            batch_size=100,
+            reconnect=1.0,
+            reconnect_cap=60.0,
+            jitter=0.5):
+        self.client_id = client_id
+        self.clean_session = clean_session
+        self.keepalive = keepalive
+        self.batch_size = batch_size
+        self.reconnect = reconnect
+        self.reconnect_cap = reconnect_cap
+        self.jitter = jitter
+        self.failures = 0
+        self.subscribed = False
+
+    # A persistent session is keyed by client id, so the default name would have every instance share, and fight over, one session
+    def identify(self, name):
+        if self.client_id or self.clean_session:
+            return self.client_id or ''
+        if name == __package__:
+            raise ValueError('A persistent session needs a client id or a name unique to this instance')
+        return name.replace('.', '_')
+
+    def client(self, name):
+        return Client(client_id=self.identify(name), clean_session=self.clean_session)
+
+    def connect(self, client, server, port):
+        client.connect_async(server, port, self.keepalive)
+        try:
+            client.reconnect()
+        except OSError as e:
+            logger.error('Error connecting to {}:{}: {}', server, port, str(e))
+        return client
+
+    # Each wait doubles up to the cap, less a random share so a fleet does not reconnect in step
+    def backoff(self):
+        delay = min(self.reconnect * 2 ** self.failures, self.reconnect_cap)
+        self.failures += 1
+        return delay * (1 - self.jitter * random())
+
+    def reset(self):
+        self.failures = 0
+
+    def subscribe(self, client, subscriptions, flags=None):
+        # A resumed session still holds our subscriptions, but a fresh process subscribes anyway to get retained values
+        if self.subscribed and not self.clean_session and flags and flags.get('session present'):
+            logger.info('Resumed session, keeping {} subscriptions', len(subscriptions))
+            return 0
+        items = list(subscriptions.items())
+        for i in range(0, len(items), self.batch_size):
+            client.subscribe(items[i:i + self.batch_size])
+        self.subscribed = True
+        return len(items)
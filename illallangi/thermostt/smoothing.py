@@ -0,0 +1,187 @@
+from array import array
+from heapq import heapify, heappop, heappush
+from math import ceil
+
+
+class Ewma(object):
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f'EWMA alpha must be in (0, 1], not {alpha}')
+        self.alpha = alpha
+        self.value = None
+
+    def reset(self):
+        self.value = None
+
+    def update(self, value, now):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+# Two heaps split at the median, with samples leaving the window deleted lazily when they reach a top, O(log n) per update
+class MovingMedian(object):
+    __slots__ = ('ring', 'index', 'filled', 'low', 'high', 'low_size', 'high_size', 'delayed')
+
+    def __init__(self, window):
+        window = int(window)
+        if window < 1:
+            raise ValueError(f'Median window must be at least 1, not {window}')
+        self.ring = array('d', bytes(8 * window))
+        self.reset()
+
+    def reset(self):
+        self.index = 0
+        self.filled = 0
+        self.low = []
+        self.high = []
+        self.low_size = 0
+        self.high_size = 0
+        self.delayed = {}
+
+    def prune(self, heap, sign):
+        while heap and self.delayed.get(sign * heap[0]):
+            value = sign * heappop(heap)
+            self.delayed[value] -= 1
+            if not self.delayed[value]:
+                del self.delayed[value]
+
+    def balance(self):
+        if self.low_size > self.high_size + 1:
+            heappush(self.high, -heappop(self.low))
+            self.low_size -= 1
+            self.high_size += 1
+            self.prune(self.low, -1)
+        elif self.low_size < self.high_size:
+            heappush(self.low, -heappop(self.high))
+            self.high_size -= 1
+            self.low_size += 1
+            self.prune(self.high, 1)
+
+    def insert(self, value):
+        if not self.low or value <= -self.low[0]:
+            heappush(self.low, -value)
+            self.low_size += 1
+        else:
+            heappush(self.high, value)
+            self.high_size += 1
+        self.balance()
+
+    def erase(self, value):
+        self.delayed[value] = self.delayed.get(value, 0) + 1
+        if value <= -self.low[0]:
+            self.low_size -= 1
+            self.prune(self.low, -1)
+        else:
+            self.high_size -= 1
+            self.prune(self.high, 1)
+        self.balance()
+
+    # Deleted samples buried below a heap top would otherwise pile up, so the heaps are rebuilt from the window
+    def compact(self):
+        values = sorted(self.ring[:self.filled])
+        middle = (len(values) + 1) // 2
+        self.low = [-v for v in reversed(values[:middle])]
+        self.high = values[middle:]
+        heapify(self.low)
+        heapify(self.high)
+        self.low_size = len(self.low)
+        self.high_size = len(self.high)
+        self.delayed = {}
+
+    def update(self, value, now):
+        window = len(self.ring)
+        self.insert(value)
+        if self.filled == window:
+            self.erase(self.ring[self.index])
+        else:
+            self.filled += 1
+        self.ring[self.index] = value
+        self.index = (self.index + 1) % window
+        if len(self.low) + len(self.high) > 2 * window:
+            self.compact()
+
+        if (self.low_size + self.high_size) % 2:
+            return -self.low[0]
+        return (-self.low[0] + self.high[0]) / 2
+
+
+# Monotonic queue over a time window, amortised O(1) per update
+class WindowExtreme(object):
+    __slots__ = ('window', 'maximum', 'limit', 'times', 'values', 'head', 'size')
+
+    def __init__(self, window, maximum=False, capacity=16):
+        if window <= 0:
+            raise ValueError(f'Window must be positive, not {window}')
+        self.window = window
+        self.maximum = maximum
+        # One sample a second fills the window, a sensor reporting faster gives up its oldest samples
+        self.limit = ceil(window) + 1
+        capacity = min(capacity, self.limit)
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.reset()
+
+    def reset(self):
+        self.head = 0
+        self.size = 0
+
+    # Every sample left in the queue is still inside the window, so the queue doubles up to its limit rather than drop one
+    def grow(self):
+        capacity = len(self.values)
+        extra = min(2 * capacity, self.limit) - capacity
+        order = [(self.head + i) % capacity for i in range(self.size)]
+        self.times = array('d', [self.times[i] for i in order]) + array('d', bytes(8 * extra))
+        self.values = array('d', [self.values[i] for i in order]) + array('d', bytes(8 * extra))
+        self.head = 0
+
+    def update(self, value, now):
+        capacity = len(self.values)
+
+        while self.size and self.times[self.head] <= now - self.window:
+            self.head = (self.head + 1) % capacity
+            self.size -= 1
+
+        while self.size:
+            back = self.values[(self.head + self.size - 1) % capacity]
+            if (back <= value) if self.maximum else (back >= value):
+                self.size -= 1
+            else:
+                break
+
+        if self.size == capacity:
+            if capacity < self.limit:
+                self.grow()
+                capacity = len(self.values)
+            else:
+                self.head = (self.head + 1) % capacity
+                self.size -= 1
+
+        tail = (self.head + self.size) % capacity
+        self.times[tail] = now
+        self.values[tail] = value
+        self.size += 1
+        return self.values[self.head]
+
+
+def smoothing(spec):
+    if not spec:
+        return None
+    kind, _, parameter = str(spec).partition(':')
+    kind = kind.strip().lower()
+    try:
+        if kind == 'ewma':
+            return Ewma(float(parameter or 0.3))
+        if kind == 'median':
+            return MovingMedian(int(parameter or 5))
+        if kind == 'min':
+            return WindowExtreme(float(parameter or 300.0))
+        if kind == 'max':
+            return WindowExtreme(float(parameter or 300.0), maximum=True)
+    except ValueError as e:
+        raise ValueError(f'Invalid smoothing {spec}: {e}')
+    raise ValueError(f'Unknown smoothing {spec}, expected ewma:<alpha>, median:<n>, min:<seconds> or max:<seconds>')
@@ -0,0 +1,138 @@
+from atexit import register
+from json import dumps, loads
+from sqlite3 import connect
+from time import monotonic, time
+
+from loguru import logger
+
+from .healthstate import HealthState
+from .loadstate import LoadState
+from .timerwheel import Timer
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshot (
+    zone TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (zone, key)
+) WITHOUT ROWID
+'''
+
+
+def components(controller):
+    yield 'load', controller.load
+    yield 'sensor', controller.sensor
+    yield 'vmax', controller.vmax
+    yield 'vmin', controller.vmin
+    for i, health in enumerate(controller.health):
+        yield f'health{i}', health
+
+
+def encode(value):
+    return dumps(value.name if isinstance(value, (HealthState, LoadState)) else value)
+
+
+class SnapshotStore(object):
+    def __init__(
+            self,
+            path,
+            *args,
+            interval=30.0,
+            max_age=300.0,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.controllers = {}
+        self.saved = {}
+        self.db = connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(SCHEMA)
+        self.timer = Timer(self.flush)
+        self.timer.rearm(monotonic() + self.interval)
+        register(self.close)
+
+    def rows(self, now, wall):
+        for controller in self.controllers.values():
+            for key, component in components(controller):
+                if component.value is None or component.updated is None:
+                    continue
+                value = encode(component.value)
+                if self.saved.get((controller.name, key)) != (value, component.updated):
+                    yield (controller.name, key, value, wall - (now - component.updated)), component.updated
+            if controller.target is not None:
+                value = encode(controller.target)
+                if self.saved.get((controller.name, 'target')) != (value, None):
+                    yield (controller.name, 'target', value, wall), None
+
+    def save(self):
+        rows = list(self.rows(monotonic(), time()))
+        if rows:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO snapshot VALUES (?, ?, ?, ?)', (row for row, _ in rows))
+            for (zone, key, value, _), updated in rows:
+                self.saved[zone, key] = (value, updated)
+        return len(rows)
+
+    def flush(self, now):
+        try:
+            logger.trace('Saved {} values to {}', self.save(), self.path)
+        except Exception as e:
+            logger.error('Error saving snapshot to {}: {}', self.path, str(e))
+        self.timer.rearm(now + self.interval)
+
+    def restore(self, controllers):
+        controllers = list(controllers)
+        now, wall = monotonic(), time()
+        rows = {
+            (zone, key): (value, updated)
+            for zone, key, value, updated in self.db.execute('SELECT zone, key, value, updated FROM snapshot')
+        }
+        restored = 0
+        for controller in controllers:
+            self.track(controller)
+            for key, component in components(controller):
+                value, updated = rows.get((controller.name, key), (None, None))
+                if value is None:
+                    continue
+                age = wall - updated
+                if age > (component.max_age or self.max_age):
+                    continue
+                value = loads(value)
+                component.value = HealthState[value] if key.startswith('health') else value
+                component.updated = now - age
+                if component.timer is not None:
+                    component.timer.rearm(component.updated + component.max_age)
+                self.saved[controller.name, key] = (encode(component.value), component.updated)
+                restored += 1
+            # The last command only means anything alongside the load it was sent to
+            value, updated = rows.get((controller.name, 'target'), (None, None))
+            if value is not None and controller.load.value is not None:
+                controller.target = LoadState[loads(value)]
+                self.saved[controller.name, 'target'] = (value, None)
+        logger.info('Restored {} values for {} zones from {}', restored, len(controllers), self.path)
+        return restored
+
+    def track(self, controller):
+        self.controllers[controller.name] = controller
+
+    def forget(self, controller):
+        if self.controllers.get(controller.name) is controller:
+            del self.controllers[controller.name]
+        for key in [key for key in self.saved if key[0] == controller.name]:
+            del self.saved[key]
+
+    def close(self):
+        if self.db is None:
+            return
+        try:
+            self.save()
+        finally:
+            self.db.close()
+            self.db = None
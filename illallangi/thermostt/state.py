@@ -0,0 +1,111 @@
+from json import dumps
+from struct import pack
+
+
+class JsonFormat(object):
+    def pair(self, key, value):
+        return f'{dumps(key)}: {dumps(value)}'
+
+    def join(self, pairs):
+        return '{' + ', '.join(pairs) + '}'
+
+
+class MsgpackFormat(object):
+    def __init__(self):
+        from msgpack import packb
+        self.packb = packb
+
+    def pair(self, key, value):
+        return self.packb(key) + self.packb(value)
+
+    def join(self, pairs):
+        n = len(pairs)
+        if n < 16:
+            header = bytes([0x80 | n])
+        elif n < 0x10000:
+            header = b'\xde' + pack('>H', n)
+        else:
+            header = b'\xdf' + pack('>I', n)
+        return header + b''.join(pairs)
+
+
+class CborFormat(object):
+    def __init__(self):
+        from cbor2 import dumps
+        self.dumps = dumps
+
+    def pair(self, key, value):
+        return self.dumps(key) + self.dumps(value)
+
+    def join(self, pairs):
+        n = len(pairs)
+        if n < 24:
+            header = bytes([0xa0 | n])
+        elif n < 0x100:
+            header = b'\xb8' + pack('>B', n)
+        elif n < 0x10000:
+            header = b'\xb9' + pack('>H', n)
+        else:
+            header = b'\xba' + pack('>I', n)
+        return header + b''.join(pairs)
+
+
+formats = {
+    'json': JsonFormat,
+    'msgpack': MsgpackFormat,
+    'cbor': CborFormat,
+}
+
+
+def get_format(name):
+    try:
+        return formats[name or 'json']()
+    except KeyError:
+        raise ValueError(f'Unknown state format {name}')
+    except ImportError as e:
+        raise ValueError(f'State format {name} is not available: {e}')
+
+
+class State(object):
+    def __init__(
+            self,
+            keys,
+            *args,
+            format=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.keys = tuple(keys)
+        self.format = get_format(format) if format is None or isinstance(format, str) else format
+        self.values = {}
+        self.pairs = {}
+        self.version = 0
+
+    def __getitem__(self, key):
+        return self.values.get(key)
+
+    def patch(self, key, value):
+        if self.values.get(key) == value and (value is not None or key not in self.values):
+            return False
+        if value is None:
+            del self.values[key]
+            del self.pairs[key]
+        else:
+            self.values[key] = value
+            self.pairs[key] = self.format.pair(key, value)
+        self.version += 1
+        return True
+
+    def snapshot(self):
+        return {
+            k: self.values[k]
+            for k in self.keys
+            if k in self.values
+        }
+
+    def serialise(self, **extra):
+        return self.format.join([
+            *(self.format.pair(k, v) for k, v in extra.items()),
+            *(self.pairs[k] for k in self.keys if k in self.pairs),
+        ])
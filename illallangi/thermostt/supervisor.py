@@ -0,0 +1,283 @@
+import signal
+from datetime import datetime
+from functools import cached_property
+from json import dumps
+from multiprocessing import get_context
+from os import kill
+from time import monotonic, sleep
+
+from loguru import logger
+
+from paho.mqtt.client import Client
+
+from . import codec, metrics
+from .config import controller, load_config, shard
+from .history import HistoryPolicy
+from .hub import Hub
+from .loop import start
+from .notifier import configure
+from .publisher import Publisher, PublishPolicy
+from .recorder import Recorder
+from .reload import Reloader
+from .session import SessionPolicy
+from .snapshot import SnapshotStore
+
+
+def selector(worker, workers):
+    def select(z):
+        return shard(z.get('name'), workers) == worker
+    return select
+
+
+def serve(
+        config,
+        *,
+        server=None,
+        port=None,
+        name=None,
+        lwt_topic=None,
+        runtime='paho',
+        record=None,
+        record_size=16,
+        metrics_port=None,
+        metrics_host='0.0.0.0',
+        snapshot=None,
+        snapshot_interval=30.0,
+        snapshot_max_age=300.0,
+        watch=False,
+        batch=False,
+        conflate=0,
+        client_id=None,
+        persistent_session=False,
+        reconnect=1.0,
+        reconnect_cap=60.0,
+        subscribe_batch=100,
+        history=False,
+        history_raw=720,
+        history_1m=1440,
+        history_15m=672,
+        worker=None,
+        workers=1):
+    c = load_config(config)
+    server = server or c['server']
+    port = port or c['port'] or 1883
+    if not server:
+        raise ValueError('No server specified on the command line or in the config file')
+
+    name = name or c['name']
+    lwt_topic = lwt_topic or c['lwt_topic']
+    select = None
+    if worker is not None:
+        select = selector(worker, workers)
+        # Each worker runs as its own hub, next to the supervisor's topics
+        name = f'{name or __package__}_{worker}'.replace('.', '_')
+        lwt_topic = f'{lwt_topic}/{worker}' if lwt_topic else None
+        record = f'{record}.{worker}' if record else None
+        metrics_port = metrics_port + worker if metrics_port else None
+        client_id = f'{client_id}_{worker}' if client_id else None
+
+    zones = [z for z in c['zones'] if select is None or select(z)]
+    controllers = [
+        controller(server, port, **z)
+        for z in zones
+    ]
+    logger.info('Loaded {} zones from {}', len(controllers), config)
+    store = SnapshotStore(snapshot, interval=snapshot_interval, max_age=snapshot_max_age) if snapshot else None
+
+    hub = Hub(
+        server,
+        port,
+        controllers,
+        name=name,
+        lwt_topic=lwt_topic,
+        recorder=Recorder(record, size=record_size * 2 ** 20) if record else None,
+        store=store,
+        batch=batch,
+        conflate=conflate,
+        session=SessionPolicy(
+            client_id=client_id,
+            clean_session=not persistent_session,
+            batch_size=subscribe_batch,
+            reconnect=reconnect,
+            reconnect_cap=reconnect_cap),
+        history=HistoryPolicy(
+            raw_capacity=history_raw,
+            minutes=history_1m,
+            quarters=history_15m) if history else None)
+    if store is not None:
+        store.restore(controllers)
+    Reloader(config, hub, zones, store=store, watch=watch, select=select).install()
+    if metrics_port:
+        metrics.enable(controllers, metrics_port, metrics_host, queue=hub.queue)
+    start(hub, runtime)
+
+
+def work(worker, workers, logging, json_backend, kwargs):
+    configure(**logging)
+    codec.use(json_backend)
+    logger.info('Worker {} of {} starting', worker, workers)
+    serve(worker=worker, workers=workers, **kwargs)
+
+
+class Supervisor(object):
+    def __init__(
+            self,
+            server,
+            port,
+            workers,
+            config,
+            *args,
+            name=None,
+            lwt_topic=None,
+            logging=None,
+            json_backend='auto',
+            restart=1.0,
+            restart_cap=60.0,
+            kwargs=None,
+            **kw):
+        super().__init__(
+            *args,
+            **kw)
+        self.server = server
+        self.port = port
+        self.workers = workers
+        self.config = config
+        self.name = name or __package__
+        self.lwt_topic = lwt_topic or f'tele/{self.name}/LWT'.replace('.', '_')
+        self.state_topic = f'tele/{self.name}/STATE'.replace('.', '_')
+        self.logging = logging or {'log_level': 'INFO'}
+        self.json_backend = json_backend
+        self.restart = restart
+        self.restart_cap = restart_cap
+        self.kwargs = dict(kwargs or {}, config=config, server=server, port=port, name=name, lwt_topic=lwt_topic)
+
+        self.context = get_context('spawn')
+        self.processes = [None] * workers
+        self.started = [None] * workers
+        self.failures = [0] * workers
+        self.restarts = [0] * workers
+        self.due = [0.0] * workers
+        self.counts = [0] * workers
+        self.stopping = False
+
+        self.policy = PublishPolicy()
+        self.lwt_publisher = Publisher(self.lwt_topic, self.policy)
+        self.state_publisher = Publisher(self.state_topic, self.policy, format=self.format)
+
+    @cached_property
+    def client(self):
+        c = Client()
+        c.on_connect = self.on_connect
+        c.will_set(self.lwt_topic, 'Offline', qos=self.policy.qos, retain=self.policy.retain)
+        return c
+
+    def on_connect(self, client, userdata, flags, rc):
+        logger.info('Connected with result code {}, supervising {} workers', rc, self.workers)
+        self.lwt_publisher.reset()
+        self.state_publisher.reset()
+        self.publish()
+
+    def zones(self):
+        counts = [0] * self.workers
+        for z in load_config(self.config)['zones']:
+            counts[shard(z.get('name'), self.workers)] += 1
+        return counts
+
+    def alive(self, worker):
+        process = self.processes[worker]
+        return process is not None and process.is_alive()
+
+    def spawn(self, worker):
+        process = self.context.Process(
+            target=work,
+            args=(worker, self.workers, self.logging, self.json_backend, self.kwargs),
+            name=f'worker-{worker}',
+            daemon=True)
+        process.start()
+        self.processes[worker] = process
+        self.started[worker] = monotonic()
+        logger.info('Started worker {} with pid {}', worker, process.pid)
+
+    def check(self, now):
+        for worker, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                process.join()
+                # A worker that stayed up for a while gets its backoff reset
+                if now - self.started[worker] >= self.restart_cap:
+                    self.failures[worker] = 0
+                self.failures[worker] += 1
+                self.restarts[worker] += 1
+                delay = min(self.restart * 2 ** (self.failures[worker] - 1), self.restart_cap)
+                logger.error('Worker {} exited with code {}, restarting in {}s', worker, process.exitcode, delay)
+                self.processes[worker] = None
+                self.due[worker] = now + delay
+            if not self.stopping and now >= self.due[worker]:
+                self.spawn(worker)
+
+    def format(self, value):
+        return dumps({'time': datetime.utcnow().isoformat(), 'workers': value})
+
+    def publish(self, now=None):
+        workers = [
+            {
+                'worker': worker,
+                'pid': process.pid if process is not None else None,
+                'alive': self.alive(worker),
+                'zones': self.counts[worker],
+                'restarts': self.restarts[worker],
+            }
+            for worker, process in enumerate(self.processes)
+        ]
+        self.lwt_publisher.publish(self.client, 'Online' if all(w['alive'] for w in workers) else 'Error', now)
+        self.state_publisher.publish(self.client, workers, now)
+
+    def recount(self):
+        self.counts = self.zones()
+        for worker, count in enumerate(self.counts):
+            logger.info('Worker {} will host {} zones', worker, count)
+
+    def on_signal(self, signum, frame):
+        if signum == signal.SIGTERM:
+            self.stopping = True
+            return
+        # Workers that reject the file keep their zones, so the counts stand too
+        try:
+            self.recount()
+        except ValueError as e:
+            logger.error('Error reading {}, keeping zone counts: {}', self.config, str(e))
+        else:
+            self.publish()
+        # Workers reload their own shard of the config on SIGHUP
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                kill(process.pid, signum)
+
+    def run(self, interval=1.0):
+        self.recount()
+        signal.signal(signal.SIGTERM, self.on_signal)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.on_signal)
+
+        self.check(monotonic())
+        self.client.connect_async(self.server, self.port, 60)
+        self.client.loop_start()
+        try:
+            while not self.stopping:
+                now = monotonic()
+                self.check(now)
+                self.publish(now)
+                self.lwt_publisher.tick(self.client, now)
+                self.state_publisher.tick(self.client, now)
+                sleep(interval)
+        finally:
+            self.stopping = True
+            for process in self.processes:
+                if process is not None:
+                    process.terminate()
+            for process in self.processes:
+                if process is not None:
+                    process.join(5.0)
+            self.client.publish(self.lwt_topic, 'Offline', qos=self.policy.qos, retain=self.policy.retain)
+            self.client.loop_stop()
@@ -0,0 +1,131 @@
+from math import ceil, floor
+
+from .clock import monotonic
+
+
+class Timer(object):
+    __slots__ = ('callback', 'owner', 'deadline', 'wheel', 'slot', 'expires')
+
+    def __init__(self, callback, owner=None):
+        self.callback = callback
+        self.owner = owner
+        self.deadline = None
+        self.wheel = None
+        self.slot = None
+        self.expires = None
+
+    def rearm(self, deadline):
+        self.deadline = deadline
+        if self.wheel is not None:
+            self.wheel.schedule(self)
+
+    # Cancelled timers are dropped lazily when their slot comes round
+    def cancel(self):
+        self.deadline = None
+
+
+class TimerWheel(object):
+    def __init__(
+            self,
+            *args,
+            resolution=1.0,
+            bits=6,
+            levels=4,
+            now=None,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.resolution = resolution
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.span = 1 << (bits * levels)
+        self.levels = [[set() for _ in range(self.size)] for _ in range(levels)]
+        self.origin = monotonic() if now is None else now
+        self.tick = 0
+
+    def __len__(self):
+        return sum(len(slot) for level in self.levels for slot in level)
+
+    def ticks(self, deadline, minimum):
+        return max(minimum, ceil((deadline - self.origin) / self.resolution))
+
+    def add(self, timer):
+        timer.wheel = self
+        if timer.deadline is not None:
+            self.schedule(timer)
+
+    def remove(self, timer):
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+        timer.slot = None
+        timer.wheel = None
+
+    def schedule(self, timer):
+        if timer.deadline is None:
+            return
+        expires = self.ticks(timer.deadline, self.tick + 1)
+        if timer.slot is not None:
+            # A later deadline is picked up when the current slot is examined
+            if timer.expires <= expires:
+                return
+            timer.slot.discard(timer)
+        self.insert(timer, expires)
+
+    def insert(self, timer, expires):
+        for level, slots in enumerate(self.levels):
+            shift = self.bits * level
+            if (expires >> shift) - (self.tick >> shift) < self.size:
+                break
+        else:
+            expires = ((self.tick >> shift) + self.mask) << shift
+        slot = slots[(expires >> shift) & self.mask]
+        slot.add(timer)
+        timer.slot = slot
+        timer.expires = expires
+
+    def due(self, timer, tick):
+        return timer.deadline is not None and self.ticks(timer.deadline, 0) <= tick
+
+    def drain(self, slot):
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            timer.slot = None
+        return timers
+
+    def advance(self, now=None):
+        now = monotonic() if now is None else now
+        target = floor((now - self.origin) / self.resolution)
+        fired = []
+
+        if target - self.tick >= self.span:
+            timers = [timer for level in self.levels for slot in level for timer in self.drain(slot)]
+            self.tick = target
+            for timer in timers:
+                if self.due(timer, target):
+                    fired.append(timer)
+                elif timer.deadline is not None:
+                    self.insert(timer, self.ticks(timer.deadline, target + 1))
+
+        while self.tick < target:
+            self.tick += 1
+            tick = self.tick
+            for level in range(1, len(self.levels)):
+                shift = self.bits * level
+                if tick & ((1 << shift) - 1):
+                    break
+                for timer in self.drain(self.levels[level][(tick >> shift) & self.mask]):
+                    if timer.deadline is not None:
+                        self.insert(timer, self.ticks(timer.deadline, tick))
+            for timer in self.drain(self.levels[0][tick & self.mask]):
+                if self.due(timer, tick):
+                    fired.append(timer)
+                elif timer.deadline is not None:
+                    self.insert(timer, self.ticks(timer.deadline, tick + 1))
+
+        for timer in fired:
+            timer.deadline = None
+            timer.callback(now)
+        return fired
@@ -0,0 +1,106 @@
+class TopicNode(object):
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.values = []
+
+
+class TopicTrie(object):
+    def __init__(
+            self,
+            *args,
+            cache_size=4096,
+            **kwargs):
+        super().__init__(
+            *args,
+            **kwargs)
+        self.root = TopicNode()
+        self.cache = {}
+        self.cache_size = cache_size
+
+    @staticmethod
+    def validate(pattern):
+        levels = pattern.split('/')
+        for i, level in enumerate(levels):
+            if level == '#' and i != len(levels) - 1:
+                raise ValueError(f'Invalid subscription {pattern}: # must be the last level')
+            if level not in ('+', '#') and ('+' in level or '#' in level):
+                raise ValueError(f'Invalid subscription {pattern}: wildcards must occupy a whole level')
+        return levels
+
+    def add(self, pattern, value):
+        node = self.root
+        for level in self.validate(pattern):
+            node = node.children.setdefault(level, TopicNode())
+        if not any(v is value for v in node.values):
+            node.values.append(value)
+        self.cache.clear()
+
+    def remove(self, pattern, value):
+        path = [self.root]
+        for level in self.validate(pattern):
+            node = path[-1].children.get(level)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].values = [v for v in path[-1].values if v is not value]
+        levels = pattern.split('/')
+        for i in range(len(levels), 0, -1):
+            if path[i].values or path[i].children:
+                break
+            del path[i - 1].children[levels[i - 1]]
+        self.cache.clear()
+
+    def __len__(self):
+        count = 0
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            count += len(node.values)
+            nodes.extend(node.children.values())
+        return count
+
+    def match(self, topic):
+        try:
+            return self.cache[topic]
+        except KeyError:
+            pass
+
+        matched = {}
+        levels = topic.split('/')
+        nodes = [self.root]
+        for i, level in enumerate(levels):
+            following = []
+            for node in nodes:
+                # Wildcards at the first level do not match $SYS style topics
+                wildcards = not (i == 0 and level.startswith('$'))
+                if wildcards:
+                    multi = node.children.get('#')
+                    if multi is not None:
+                        for value in multi.values:
+                            matched[id(value)] = value
+                    single = node.children.get('+')
+                    if single is not None:
+                        following.append(single)
+                child = node.children.get(level)
+                if child is not None:
+                    following.append(child)
+            nodes = following
+            if not nodes:
+                break
+
+        for node in nodes:
+            for value in node.values:
+                matched[id(value)] = value
+            # 'a/#' also matches the parent level 'a'
+            multi = node.children.get('#')
+            if multi is not None:
+                for value in multi.values:
+                    matched[id(value)] = value
+
+        result = list(matched.values())
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[topic] = result
+        return result
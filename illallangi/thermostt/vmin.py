@@ -2,6 +2,8 @@ from .sensor import Sensor
 
 
 class VMin(Sensor):
+    __slots__ = ()
+
     def __init__(
             self,
             name,
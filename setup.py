@@ -30,5 +30,15 @@ setuptools.setup(
         'loguru',
         'paho-mqtt',
         'notifiers',
-    ]
+        'PyYAML',
+    ],
+    extras_require={
+        'orjson': ['orjson'],
+        'ujson': ['ujson'],
+        'msgpack': ['msgpack'],
+        'cbor': ['cbor2'],
+        'toml': ['tomli; python_version < "3.11"'],
+        'batch': ['numpy'],
+        'benchmark': ['pytest', 'pytest-benchmark'],
+    }
 )
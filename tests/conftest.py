@@ -0,0 +1,54 @@
+import pytest
+
+from illallangi.thermostt.config import controller
+
+
+class Client(object):
+    def __init__(self):
+        self.published = []
+        self.subscriptions = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+    def subscribe(self, topics, qos=0):
+        self.subscriptions.append(topics)
+
+    def unsubscribe(self, topic):
+        pass
+
+    def topics(self):
+        return dict(
+            pair
+            for topics in self.subscriptions
+            for pair in ([(topics, 0)] if isinstance(topics, str) else topics)
+        )
+
+    def commands(self):
+        return [p for p in self.published if p[0].endswith('/POWER')]
+
+
+@pytest.fixture
+def make_client():
+    return Client
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
+
+
+# Builds a zone on a recording client, any option can be overridden
+@pytest.fixture
+def zone(make_client):
+    def zone(**options):
+        c = controller('localhost', 1883, **{
+            'name': 'lounge',
+            'load': 'plug',
+            'sensor': 'probe',
+            'sensor_health': 'tas',
+            **options,
+        })
+        c.client = make_client()
+        return c
+    return zone
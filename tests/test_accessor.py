@@ -0,0 +1,74 @@
+import pytest
+
+from jmespath import compile as jmespath_compile
+from jmespath.parser import ParsedResult
+
+from illallangi.thermostt.accessor import FieldPath, IdLookup, compile
+
+
+documents = [
+    None,
+    'Online',
+    22.5,
+    [],
+    {},
+    {'payload': None},
+    {'payload': 'Online'},
+    {'payload': 21},
+    {'payload': [1, 2]},
+    {'payload': {'POWER': 'ON', 'Wifi': {'RSSI': 80}}},
+    {'payload': {'POWER': None, 'Wifi': 'down'}},
+    {'payload': {'Wifi': {'RSSI': {'Now': 1}}}},
+    {'payload': {
+        'Time': '2020-09-12T10:15:42',
+        'DS18B20-1': {'Id': '01', 'Temperature': 20.1},
+        'DS18B20-2': {'Id': '02', 'Temperature': 20.2, 'Extra': {'Raw': 2}},
+        'DS18B20-3': {'Id': '02', 'Temperature': 99.0},
+        'TempUnit': 'C',
+    }},
+    {'payload': {'A': {'Id': 2, 'Temperature': 1.0}, 'B': ['Id', '02'], 'C': {'Id': '02'}}},
+    {'payload': {'A': {'Temperature': 1.0}}},
+    {'payload': {'sensors': {'A': {'Name': 'probe', 'Value': 3}}}},
+]
+
+supported = [
+    ('payload', FieldPath),
+    ('payload.POWER', FieldPath),
+    ('payload.Wifi.RSSI', FieldPath),
+    ('payload.Wifi.RSSI.Now', FieldPath),
+    ("values(payload)[?Id=='01']|[0].Temperature", IdLookup),
+    ("values(payload)[?Id=='02']|[0].Temperature", IdLookup),
+    ("values(payload)[?Id=='02']|[0].Extra.Raw", IdLookup),
+    ("values(payload)[?Id=='02']|[0]", IdLookup),
+    ("values(payload)[?Id=='missing']|[0].Temperature", IdLookup),
+    ("values(payload.sensors)[?Name=='probe']|[0].Value", IdLookup),
+]
+
+unsupported = [
+    "values(payload)[?Id=='01']|[1].Temperature",
+    "values(payload)[?Id!='01']|[0].Temperature",
+    'values(payload)[?Id==`2`]|[0].Temperature',
+    'payload.*',
+    'payload[0]',
+    'length(payload)',
+]
+
+
+def outcome(search, document):
+    try:
+        return search(document)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('expression, accessor', supported)
+@pytest.mark.parametrize('document', documents)
+def test_compiled_matches_jmespath(expression, accessor, document):
+    compiled = compile(expression)
+    assert isinstance(compiled, accessor)
+    assert outcome(compiled.search, document) == outcome(jmespath_compile(expression).search, document)
+
+
+@pytest.mark.parametrize('expression', unsupported)
+def test_unsupported_expressions_fall_back_to_jmespath(expression):
+    assert isinstance(compile(expression), ParsedResult)
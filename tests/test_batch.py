@@ -0,0 +1,53 @@
+from random import Random
+
+import pytest
+
+from illallangi.thermostt.hub import Hub
+from illallangi.thermostt.message import Message
+
+
+pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def build(zone, make_client):
+    def build(zones, batch):
+        controllers = [
+            zone(name=f'z{i}', load=f'p{i}', sensor=f'S{i}', q1='ON', q0='OFF', qe='OFF,ERR')
+            for i in range(zones)
+        ]
+        client = make_client()
+        return Hub('localhost', 1883, controllers, client=client, batch=batch), client, controllers
+    return build
+
+
+def stream(zones, count, seed):
+    rnd = Random(seed)
+    for _ in range(count):
+        i = rnd.randrange(zones)
+        yield rnd.choice([
+            (f'tele/p{i}/STATE', '{"POWER":"%s"}' % rnd.choice(['ON', 'OFF', 'ERR', 'X'])),
+            (f'cmnd/z{i}/vmax', str(rnd.choice([20, 21, 22]))),
+            (f'cmnd/z{i}/vmin', str(rnd.choice([19, 20, 21]))),
+            ('tele/tas/SENSOR', '{"A":{"Id":"S%d","Temperature":%s}}' % (i, rnd.choice([18, 19.5, 20, 20.5, 21, 22, 23]))),
+            ('tele/tas/LWT', rnd.choice(['Online', 'Online', 'Online', 'Offline'])),
+            (f'tele/p{i}/LWT', rnd.choice(['Online', 'Online', 'Offline'])),
+        ])
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_batch_engine_matches_per_message_decisions(build, seed):
+    zones = 50
+    single, single_client, single_zones = build(zones, False)
+    batch, batch_client, batch_zones = build(zones, True)
+    for c in single_zones:
+        c.update()
+    batch.tick()
+    for step, (topic, payload) in enumerate(stream(zones, 3000, seed)):
+        single.on_message(single_client, None, Message(topic, payload.encode('UTF-8')))
+        batch.on_message(batch_client, None, Message(topic, payload.encode('UTF-8')))
+        batch.tick()
+        assert [c.target for c in batch_zones] == [c.target for c in single_zones], (step, topic, payload)
+        assert [c.commands.pending for c in batch_zones] == [c.commands.pending for c in single_zones], (step, topic, payload)
+    # With setpoints crossed a single decision can send ON then OFF, where a batch sends only the outcome
+    assert dict(batch_client.commands()) == dict(single_client.commands())
@@ -0,0 +1,24 @@
+import pytest
+
+from jmespath import compile as jmespath_compile
+
+from illallangi.thermostt.accessor import compile
+from illallangi.thermostt.benchmark import filters, payloads, stages, zone
+
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.mark.parametrize('expression, name', filters)
+@pytest.mark.parametrize('accessor', ['jmespath', 'compiled'])
+def test_filter(benchmark, expression, name, accessor):
+    payload = payloads[name]
+    search = (jmespath_compile if accessor == 'jmespath' else compile)(expression).search
+    benchmark.group = f'filter {expression}'
+    assert benchmark(search, payload) == jmespath_compile(expression).search(payload)
+
+
+@pytest.mark.parametrize('stage', list(stages(zone())))
+def test_pipeline(benchmark, stage):
+    benchmark.group = 'pipeline'
+    benchmark(stages(zone())[stage])
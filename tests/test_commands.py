@@ -0,0 +1,56 @@
+import pytest
+
+from illallangi.thermostt.healthstate import HealthState
+from illallangi.thermostt.loadstate import LoadState
+
+
+@pytest.fixture
+def healthy(zone):
+    c = zone(command_retry=10.0)
+    c.load.value = 'OFF'
+    c.vmax.value = 21.0
+    c.vmin.value = 19.0
+    for h in c.health:
+        h.value = HealthState.Healthy
+    return c
+
+
+def test_at_most_one_outstanding_command(healthy):
+    c = healthy
+    c.sensor.value = 22.0
+    c.decide()
+    c.decide()
+    assert c.client.commands() == [('cmnd/plug/POWER', 'ON')]
+    assert c.commands.pending is LoadState.Q1
+
+    c.sensor.value = 18.0
+    c.decide()
+    assert c.client.commands() == [('cmnd/plug/POWER', 'ON'), ('cmnd/plug/POWER', 'OFF')]
+    assert c.commands.pending is LoadState.Q0
+
+
+def test_no_retries_while_unhealthy(healthy):
+    c = healthy
+    c.sensor.value = 22.0
+    c.decide()
+    assert c.commands.pending is LoadState.Q1
+
+    c.health[0].value = HealthState.Unhealthy
+    c.decide()
+    # The load already reports OFF, which is Qe, so the replacement is acknowledged straight away
+    c.decide()
+    assert c.commands.pending is None
+
+    sent = len(c.client.commands())
+    for now in (1e6, 2e6, 3e6):
+        assert not c.commands.tick(c.client, now)
+    assert len(c.client.commands()) == sent
+    assert c.client.commands()[-1] == ('cmnd/plug/POWER', 'OFF')
+
+
+def test_retries_while_healthy(healthy):
+    c = healthy
+    c.sensor.value = 22.0
+    c.decide()
+    assert c.commands.tick(c.client, c.commands.retry)
+    assert c.client.commands() == [('cmnd/plug/POWER', 'ON')] * 2
@@ -0,0 +1,59 @@
+import pytest
+
+from illallangi.thermostt.fakeclient import FakeClient
+from illallangi.thermostt.config import controller, load_config
+from illallangi.thermostt.hub import Hub
+from illallangi.thermostt.reload import Reloader
+
+
+GOOD = '''
+server: localhost
+zones:
+  - name: lounge
+    load: plug
+    sensor: probe
+    sensor-health: tas
+    sensor-max-age: 60
+'''
+
+
+@pytest.mark.parametrize('option, value', [
+    ('sensor-delta', '"abc"'),
+    ('vmax-max-age', '"60"'),
+    ('sensor-max-age', '-1'),
+    ('state-heartbeat', 'true'),
+    ('state-retain', '"yes"'),
+    ('command-retry', '[10]'),
+    ('sensor-smoothing', 'median:0'),
+    ('load-qos', '3'),
+])
+def test_wrong_values_are_rejected_at_load(tmp_path, option, value):
+    path = tmp_path / 'config.yaml'
+    path.write_text(GOOD + f'    {option}: {value}\n')
+    with pytest.raises(ValueError, match=option.replace('-', '_')):
+        load_config(str(path))
+
+
+def test_good_values_load(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text(GOOD + '    sensor-delta: -0.5\n    state-retain: true\n    sensor-smoothing: ewma:0.5\n')
+    z = load_config(str(path))['zones'][0]
+    assert z['sensor_delta'] == -0.5
+    assert z['state_retain'] is True
+
+
+def test_bad_reload_keeps_the_running_configuration(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text(GOOD)
+    zones = load_config(str(path))['zones']
+    hub = Hub('localhost', 1883, [controller('localhost', 1883, **z) for z in zones], client=FakeClient())
+    reloader = Reloader(str(path), hub, zones)
+    running = list(hub.controllers)
+
+    path.write_text(GOOD.replace('sensor-max-age: 60', 'sensor-max-age: "60"'))
+    assert not reloader.reload()
+    assert hub.controllers == running
+
+    path.write_text(GOOD.replace('sensor-max-age: 60', 'sensor-max-age: 90'))
+    assert reloader.reload()
+    assert hub.controllers[0].sensor.max_age == 90
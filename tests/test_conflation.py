@@ -0,0 +1,58 @@
+from json import loads
+
+from illallangi.thermostt.conflation import ConflationQueue
+from illallangi.thermostt.history import HistoryPolicy
+from illallangi.thermostt.hub import Hub
+from illallangi.thermostt.loadtest import BrokerMessage
+
+
+def message(topic, payload):
+    return BrokerMessage(topic, payload.encode('UTF-8'))
+
+
+def test_state_topics_conflate_in_arrival_order():
+    q = ConflationQueue(10)
+    q.put(message('tele/a/SENSOR', '1'))
+    q.put(message('tele/b/STATE', '2'))
+    q.put(message('tele/a/SENSOR', '3'))
+    drained = []
+    assert q.drain(drained.append) == 2
+    assert [(m.topic, m.payload) for m in drained] == [('tele/a/SENSOR', b'3'), ('tele/b/STATE', b'2')]
+    assert q.superseded == 1
+
+
+def test_requests_pass_through():
+    q = ConflationQueue(10, passthrough=['cmnd/hub/history'])
+    q.put(message('cmnd/hub/history', '{"id": 1}'))
+    q.put(message('tele/a/SENSOR', '1'))
+    q.put(message('cmnd/hub/history', '{"id": 2}'))
+    q.put(message('tele/a/SENSOR', '2'))
+    drained = []
+    assert q.drain(drained.append) == 3
+    assert [m.payload for m in drained] == [b'{"id": 1}', b'2', b'{"id": 2}']
+    assert q.superseded == 1
+
+
+def test_limit_applies_to_requests():
+    q = ConflationQueue(2, passthrough=['cmnd/hub/history'])
+    assert q.put(message('cmnd/hub/history', '1'))
+    assert q.put(message('cmnd/hub/history', '2'))
+    assert not q.put(message('cmnd/hub/history', '3'))
+    assert q.dropped == 1
+
+
+def test_hub_answers_every_queued_history_request(zone, client):
+    c = zone()
+    hub = Hub('localhost', 1883, [c], name='hub', client=client, conflate=100, history=HistoryPolicy())
+    for i in range(3):
+        hub.on_message(client, None, message('cmnd/hub/history', f'{{"id": {i}, "zone": "lounge"}}'))
+        hub.on_message(client, None, message('cmnd/lounge/vmax', f'2{i}'))
+    hub.drain()
+    responses = [loads(payload) for topic, payload in client.published if topic == 'stat/hub/history']
+    assert [r['id'] for r in responses] == [0, 1, 2]
+    assert c.vmax.value == 22.0
+
+
+def test_controller_passes_its_history_requests_through(zone):
+    c = zone(conflate=100, history=HistoryPolicy())
+    assert c.queue.passthrough == {'cmnd/lounge/history'}
@@ -0,0 +1,31 @@
+from json import loads
+
+from illallangi.thermostt.history import HistoryPolicy
+
+
+def test_state_is_published_on_change_only(zone):
+    c = zone()
+    c.sensor.value = 20.5
+    c.publish(now=0.0)
+    c.publish(now=1.0)
+    c.vmax.value = 21.0
+    c.publish(now=2.0)
+    states = [loads(payload) for topic, payload in c.client.published if topic == 'tele/lounge/STATE']
+    assert [s.get('vmax') for s in states] == [None, 21.0]
+    assert all(s['sensor'] == 20.5 for s in states)
+    current = loads(str(c))
+    assert current.pop('time') and current == {k: v for k, v in states[-1].items() if k != 'time'}
+
+
+def test_connected_controller_subscribes_history_requests(zone):
+    c = zone(history=HistoryPolicy())
+    c.on_connect(c.client, None, {}, 0)
+    topics = c.client.topics()
+    assert 'cmnd/lounge/history' in topics
+    assert set(c.topics) < set(topics)
+
+
+def test_components_are_slotted(zone):
+    c = zone()
+    for component in c.components:
+        assert not hasattr(component, '__dict__')
@@ -0,0 +1,107 @@
+import sys
+import tracemalloc
+from threading import Event, Thread
+
+from illallangi.thermostt.history import History, HistoryPolicy, query
+
+
+T0 = 1_000_000 * 900.0
+
+
+def test_raw_keeps_the_latest_samples_in_order():
+    h = History(raw_window=3600, raw_capacity=20)
+    for i in range(50):
+        h.record(float(i), T0 + i)
+    rows = h.query('raw', now=T0 + 50)['rows']
+    assert rows == [[T0 + i, float(i)] for i in range(30, 50)]
+    assert h.query('raw', since=T0 + 45, now=T0 + 50)['rows'] == [[T0 + i, float(i)] for i in range(45, 50)]
+    assert h.query('raw', now=T0 + 5000)['rows'] == []
+
+
+def test_tiers_bucket_min_mean_max():
+    h = History(minutes=3, quarters=2)
+    for i in range(10):
+        h.record(20.0 + i, T0 + i * 30)
+    assert h.query('1m', now=T0 + 300)['rows'] == [
+        [T0 + 120, 24.0, 24.5, 25.0, 2],
+        [T0 + 180, 26.0, 26.5, 27.0, 2],
+        [T0 + 240, 28.0, 28.5, 29.0, 2],
+    ]
+    assert h.query('15m', now=T0 + 300)['rows'] == [[T0, 20.0, 24.5, 29.0, 10]]
+
+
+def test_growing_rings_match_the_full_history():
+    h = History(raw_capacity=100, minutes=50, quarters=10)
+    samples = [(T0 + i * 17, float(i % 13)) for i in range(2000)]
+    for now, value in samples:
+        h.record(value, now)
+    now = samples[-1][0]
+    assert h.query('raw', now=now)['rows'] == [[t, v] for t, v in samples[-100:]]
+    minutes = {}
+    for t, v in samples:
+        minutes.setdefault(int(t // 60), []).append(v)
+    expected = [[k * 60, min(v), sum(v) / len(v), max(v), len(v)] for k, v in sorted(minutes.items())][-50:]
+    assert h.query('1m', now=now)['rows'] == expected
+
+
+def test_per_zone_memory_is_bounded(zone):
+    zones = [zone(name=f'z{i}', load=f'z{i}_plug', sensor=f'z{i}_probe') for i in range(50)]
+    tracemalloc.start()
+    for c in zones:
+        HistoryPolicy().attach(c)
+        c.vmax.value = 21.0
+        c.vmin.value = 19.0
+        for i in range(12):
+            c.sensor.value = 20.0 + i / 10
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # An hour of five-minute readings and two setpoints stays far below the 288kB a preallocated zone took
+    assert used / len(zones) < 16 * 1024
+
+
+def test_full_history_stays_within_capacity():
+    h = History(raw_capacity=720, minutes=1440, quarters=672)
+    for i in range(200_000):
+        h.record(20.0, T0 + i * 5)
+    assert len(h.raw.times) == 720
+    assert len(h.tiers['1m'].keys) == 1440
+    assert len(h.tiers['15m'].keys) == 672
+
+
+def test_query_errors(zone):
+    c = zone()
+    HistoryPolicy().attach(c)
+    c.sensor.value = 20.0
+    assert list(query([c], zone='lounge')['zones']) == ['lounge']
+    for kwargs in ({'zone': 'nope'}, {'series': 'load'}, {'tier': '5m'}):
+        try:
+            query([c], **kwargs)
+        except ValueError:
+            continue
+        raise AssertionError(kwargs)
+
+
+def test_rows_never_see_an_empty_bucket_while_recording():
+    # Switching threads every few bytecodes lands the reader mid-update
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(20):
+            # Rings large enough to keep growing, so every bucket is a fresh slot
+            h = History(raw_capacity=5_000, minutes=5_000, quarters=5_000)
+            done = Event()
+
+            def record():
+                for i in range(5_000):
+                    h.record(20.0, T0 + i * 900)
+                done.set()
+
+            writer = Thread(target=record)
+            writer.start()
+            try:
+                while not done.is_set():
+                    h.query('15m', now=T0)
+            finally:
+                writer.join()
+    finally:
+        sys.setswitchinterval(interval)
@@ -0,0 +1,28 @@
+import pytest
+
+from loguru import logger
+
+from illallangi.thermostt.fakeclient import FakeClient
+from illallangi.thermostt.hub import Hub
+from illallangi.thermostt.loadtest import simulate
+
+
+@pytest.fixture(autouse=True)
+def enable_logging():
+    yield
+    logger.enable('illallangi.thermostt')
+
+
+@pytest.mark.parametrize('shared', [True, False])
+def test_simulate(shared):
+    result = simulate(16, duration=120.0, step=1.0, teleperiod=10.0, shared=shared)
+    assert result['zones'] == 16
+    assert result['messages'] > 0
+    assert result['commands'] > 0
+
+
+def test_fake_client_accepts_batched_subscribe():
+    client = FakeClient()
+    Hub('localhost', 1883, [], client=client).session.subscribe(client, {'a/b': 0, 'c/+': 1})
+    client.subscribe('d/#')
+    assert client.subscribed == 3
@@ -0,0 +1,113 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import loads
+from threading import Event, Thread
+from time import monotonic, sleep
+
+import pytest
+
+from notifiers import get_notifier
+
+from illallangi.thermostt.notifier import QueuedNotifier
+
+
+class Webhook(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        server.requests += 1
+        server.release.wait(10)
+        if server.failures > 0:
+            server.failures -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        server.received.append(body['text'])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Webhook)
+    server.requests = 0
+    server.failures = 0
+    server.received = []
+    server.release = Event()
+    server.release.set()
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.release.set()
+    server.shutdown()
+
+
+def notifier(server, **kwargs):
+    return QueuedNotifier(
+        get_notifier('slack'),
+        defaults={'webhook_url': f'http://127.0.0.1:{server.server_port}/hook'},
+        **kwargs)
+
+
+def wait(condition, timeout=5.0):
+    deadline = monotonic() + timeout
+    while not condition():
+        assert monotonic() < deadline
+        sleep(0.01)
+
+
+def test_batches_keep_order_and_coalesce(webhook):
+    n = notifier(webhook, batch_interval=0.2)
+    for message in ('first', 'second', 'second', 'third'):
+        n(message)
+    wait(lambda: webhook.received)
+    assert webhook.received == ['first\nsecond (x2)\nthird']
+    n('fourth')
+    wait(lambda: len(webhook.received) == 2)
+    assert webhook.received[1] == 'fourth'
+    n.close()
+
+
+def test_retries_a_failed_batch(webhook):
+    webhook.failures = 2
+    n = notifier(webhook, batch_interval=0.05, retry_delay=0.05)
+    n('switching')
+    wait(lambda: n.sent)
+    assert webhook.received == ['switching']
+    assert webhook.requests == 3
+    assert (n.sent, n.failed) == (1, 0)
+    n.close()
+
+
+def test_gives_up_after_retries(webhook):
+    webhook.failures = 10
+    n = notifier(webhook, batch_interval=0.05, retries=1, retry_delay=0.05)
+    n('lost')
+    wait(lambda: n.failed)
+    assert webhook.requests == 2
+    assert webhook.received == []
+
+
+def test_hung_webhook_does_not_block_callers(webhook):
+    webhook.release.clear()
+    n = notifier(webhook, maxsize=10, batch_size=1, batch_interval=0.05)
+    n('stuck')
+    wait(lambda: webhook.requests)
+
+    latencies = []
+    for i in range(200):
+        start = monotonic()
+        n(f'message {i}')
+        latencies.append(monotonic() - start)
+    assert max(latencies) < 0.01
+    assert n.dropped == 190
+
+    webhook.release.set()
+    wait(lambda: len(webhook.received) == 11)
+    # The drop count rides along with the next batch sent
+    assert webhook.received[0] == 'stuck'
+    assert webhook.received[1] == 'message 0\n190 notifications dropped while the notifier was busy'
+    assert webhook.received[2:] == [f'message {i}' for i in range(1, 10)]
+    n.close()
@@ -0,0 +1,49 @@
+from json import dumps
+
+from illallangi.thermostt import clock
+from illallangi.thermostt.loadstate import LoadState
+from illallangi.thermostt.recorder import Recorder
+from illallangi.thermostt.replay import replay
+
+
+def record(path, messages):
+    recorder = Recorder(str(path), size=2 ** 16)
+    for timestamp, topic, payload in messages:
+        recorder.record(topic, payload.encode('UTF-8'), timestamp=timestamp)
+    recorder.close()
+
+
+def reading(temperature):
+    return dumps({'DS18B20-1': {'Id': 'probe', 'Temperature': temperature}, 'TempUnit': 'C'})
+
+
+def setup(start):
+    return [
+        (start, 'tele/plug/LWT', 'Online'),
+        (start, 'tele/tas/LWT', 'Online'),
+        (start, 'tele/plug/STATE', dumps({'POWER': 'OFF'})),
+        (start, 'cmnd/lounge/vmax', '21'),
+        (start, 'cmnd/lounge/vmin', '19'),
+        (start, 'tele/tas/SENSOR', reading(18.0)),
+    ]
+
+
+def test_expiry_follows_recorded_time(tmp_path, zone):
+    path = tmp_path / 'recording'
+    record(path, setup(1000.0) + [(1200.0, 'tele/plug/STATE', dumps({'POWER': 'ON'}))])
+    c = zone(sensor_max_age=60.0)
+    decisions = [replayed for _, _, _, _, replayed in replay(str(path), [c])]
+    assert decisions[5] == 'lounge=Q0'
+    # The reading is three minutes old by the last message, although the replay took milliseconds
+    assert c.sensor.value is None
+    assert c.target is LoadState.Qe
+    assert clock.current is None
+
+
+def test_no_expiry_within_recorded_max_age(tmp_path, zone):
+    path = tmp_path / 'recording'
+    record(path, setup(1000.0) + [(1030.0, 'tele/plug/STATE', dumps({'POWER': 'ON'}))])
+    c = zone(sensor_max_age=60.0)
+    list(replay(str(path), [c]))
+    assert c.sensor.value == 18.0
+    assert c.target is LoadState.Q0
@@ -0,0 +1,34 @@
+import pytest
+
+from illallangi.thermostt.hub import Hub
+from illallangi.thermostt.session import SessionPolicy
+
+
+def test_persistent_session_needs_an_identity():
+    with pytest.raises(ValueError):
+        Hub('localhost', 1883, [], session=SessionPolicy(clean_session=False))
+
+
+def test_persistent_session_client_id():
+    assert SessionPolicy(clean_session=False).identify('site.north') == 'site_north'
+    assert SessionPolicy(client_id='thermo-1', clean_session=False).identify('illallangi.thermostt') == 'thermo-1'
+    assert SessionPolicy().identify('illallangi.thermostt') == ''
+
+
+def test_backoff_is_capped_and_jittered():
+    session = SessionPolicy(reconnect=1.0, reconnect_cap=8.0, jitter=0.5)
+    delays = [session.backoff() for _ in range(10)]
+    for i, delay in enumerate(delays):
+        cap = min(2 ** i, 8.0)
+        assert cap / 2 <= delay <= cap
+    session.reset()
+    assert session.backoff() <= 1.0
+
+
+def test_subscribe_batches_and_resumes(client):
+    session = SessionPolicy(client_id='thermo-1', clean_session=False, batch_size=2)
+    topics = {'a': 0, 'b': 1, 'c': 0}
+    assert session.subscribe(client, topics, {'session present': 1}) == 3
+    assert client.subscriptions == [[('a', 0), ('b', 1)], [('c', 0)]]
+    assert session.subscribe(client, topics, {'session present': 1}) == 0
+    assert session.subscribe(client, topics, {'session present': 0}) == 3
@@ -0,0 +1,77 @@
+from random import Random
+from statistics import median
+
+import pytest
+
+from illallangi.thermostt.smoothing import Ewma, MovingMedian, WindowExtreme, smoothing
+
+
+@pytest.mark.parametrize('window', [1, 2, 5, 8, 31])
+def test_median_matches_brute_force(window):
+    rnd = Random(window)
+    m = MovingMedian(window)
+    samples = []
+    for i in range(2000):
+        # A narrow range gives plenty of duplicates
+        value = float(rnd.randint(0, 12)) / 2
+        samples.append(value)
+        assert m.update(value, i) == median(samples[-window:])
+
+
+@pytest.mark.parametrize('maximum', [False, True])
+def test_extreme_matches_brute_force_beyond_initial_capacity(maximum):
+    rnd = Random(1)
+    w = WindowExtreme(1000.0, maximum=maximum, capacity=4)
+    samples = []
+    for i in range(3000):
+        # A long rising or falling run keeps every sample in the queue
+        value = (i if i < 1500 else rnd.random() * 100) * (-1 if maximum else 1)
+        samples.append((i, value))
+        inside = [v for t, v in samples if t > i - 1000.0]
+        assert w.update(value, i) == (max(inside) if maximum else min(inside))
+
+
+@pytest.mark.parametrize('spec', ['ewma:0.5', 'median:3', 'min:60', 'max:60'])
+def test_reset_forgets_previous_samples(spec):
+    s = smoothing(spec)
+    for i in range(5):
+        s.update(10.0, i)
+    s.reset()
+    assert s.update(20.0, 10) == 20.0
+
+
+def test_sensor_expiry_resets_smoothing(zone):
+    c = zone(sensor_smoothing='median:3', sensor_max_age=60.0)
+    for value in (10.0, 10.0, 10.0):
+        c.sensor.on_value(value)
+    c.sensor.expire(0.0)
+    assert c.sensor.value is None
+    c.sensor.on_value(20.0)
+    assert c.sensor.value == 20.0
+
+
+def test_invalid_specs():
+    for spec in ('ewma:0', 'median:0', 'min:-1', 'bogus'):
+        with pytest.raises(ValueError):
+            smoothing(spec)
+    assert smoothing(None) is None
+    assert isinstance(smoothing('ewma'), Ewma)
+
+
+@pytest.mark.parametrize('window', [1, 5, 32])
+def test_median_memory_is_bounded_by_window(window):
+    m = MovingMedian(window)
+    for i in range(100000):
+        m.update(float(i), i)
+        assert len(m.low) + len(m.high) <= 2 * window
+        assert len(m.delayed) <= 2 * window
+    assert m.update(100000.0, 100000) == median(float(i) for i in range(100001 - window, 100001))
+
+
+def test_extreme_memory_is_bounded_by_window():
+    w = WindowExtreme(60.0)
+    for i in range(100000):
+        # Ten rising samples a second keep every one of them in the queue
+        w.update(float(i), i / 10)
+        assert len(w.values) <= 61
+    assert w.update(0.0, 10000.0) == 0.0
@@ -0,0 +1,33 @@
+import signal
+from json import loads
+
+import pytest
+
+from illallangi.thermostt.config import shard
+from illallangi.thermostt.supervisor import Supervisor
+
+
+def config(names):
+    return 'zones:\n' + ''.join(f'  - name: {n}\n    load: {n}_plug\n    sensor: {n}_probe\n' for n in names)
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGHUP'), reason='needs SIGHUP')
+def test_sighup_recounts_zones_and_republishes(tmp_path, client):
+    path = tmp_path / 'config.yaml'
+    path.write_text(config(['a', 'b']))
+    s = Supervisor('localhost', 1883, 2, str(path), name='super')
+    s.client = client
+    s.recount()
+    s.publish(0.0)
+
+    names = ['a', 'b', 'c', 'd', 'e']
+    path.write_text(config(names))
+    s.on_signal(signal.SIGHUP, None)
+    expected = [sum(shard(n, 2) == w for n in names) for w in range(2)]
+    assert s.counts == expected
+    state = loads([p for t, p in s.client.published if t == 'tele/super/STATE'][-1])
+    assert [w['zones'] for w in state['workers']] == expected
+
+    path.write_text('zones: [{name: a}]\n')
+    s.on_signal(signal.SIGHUP, None)
+    assert s.counts == expected
@@ -0,0 +1,62 @@
+from itertools import product
+
+import pytest
+
+from paho.mqtt.client import topic_matches_sub
+
+from illallangi.thermostt.topictrie import TopicTrie
+
+
+FILTERS = [
+    '#', '+', '+/+', '+/#', 'a', 'a/b', 'a/+', 'a/#', 'a/+/c', 'a/b/#', '+/b/c', 'a//c', 'a/+/+',
+    '/a', '/+', '+/', 'a/', '$SYS/#', '$SYS/+', '$SYS/broker/+', 'tele/+/SENSOR', 'tele/#',
+]
+TOPICS = [
+    'a', 'a/b', 'a/b/c', 'a/c', 'a//c', 'a/', '/a', '/', '', 'b/b/c', 'a/b/c/d',
+    '$SYS', '$SYS/broker', '$SYS/broker/load', 'tele/tas1/SENSOR', 'tele/tas1/STATE', 'tele//SENSOR',
+]
+
+
+@pytest.mark.parametrize('subscription,topic', list(product(FILTERS, TOPICS)))
+def test_matches_paho(subscription, topic):
+    trie = TopicTrie()
+    trie.add(subscription, subscription)
+    assert (trie.match(topic) == [subscription]) == topic_matches_sub(subscription, topic)
+
+
+@pytest.mark.parametrize('topic', TOPICS)
+def test_all_filters_at_once(topic):
+    trie = TopicTrie()
+    for subscription in FILTERS:
+        trie.add(subscription, subscription)
+    assert sorted(trie.match(topic)) == sorted(s for s in FILTERS if topic_matches_sub(s, topic))
+
+
+def test_multiple_subscribers_on_one_filter():
+    trie = TopicTrie()
+    first, second = object(), object()
+    trie.add('tele/+/SENSOR', first)
+    trie.add('tele/+/SENSOR', second)
+    trie.add('tele/+/SENSOR', first)
+    assert trie.match('tele/tas1/SENSOR') == [first, second]
+    assert len(trie) == 2
+
+    trie.remove('tele/+/SENSOR', first)
+    assert trie.match('tele/tas1/SENSOR') == [second]
+    trie.remove('tele/+/SENSOR', second)
+    assert trie.match('tele/tas1/SENSOR') == []
+    assert not trie.root.children
+
+
+def test_subscriber_on_overlapping_filters_matches_once():
+    trie = TopicTrie()
+    value = object()
+    trie.add('tele/#', value)
+    trie.add('tele/+/SENSOR', value)
+    assert trie.match('tele/tas1/SENSOR') == [value]
+
+
+@pytest.mark.parametrize('subscription', ['a/#/b', 'a/b#', 'a/+b', '#/a'])
+def test_invalid_filters(subscription):
+    with pytest.raises(ValueError):
+        TopicTrie().add(subscription, object())